@@ -0,0 +1,212 @@
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import resource
+import subprocess
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "Investigation"))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "Resource_Deploy"))
+
+from fake_gcp_backend import FakeApiServer, FakeGcpBackend  # noqa: E402
+from tabulate import tabulate  # noqa: E402
+
+INVESTIGATION_MODES = ("serial", "parallel", "bulk", "deep")
+ASSET_ID_FORMATS = ("gs://{}", "https://storage.googleapis.com/{}", "{}")
+
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB (Linux reports ru_maxrss in KB)."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def make_server(args):
+    return FakeApiServer(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                         error_rate=args.error_rate, quota_rps=args.quota_rps, seed=args.seed)
+
+
+def write_synthetic_csv(path, rows, unique_buckets, backend):
+    """
+    Write a findings export with `rows` rows spread over `unique_buckets` buckets.
+
+    Asset IDs rotate between gs://, https:// and bare bucket names so that the
+    investigation's normalization and de-duplication are exercised.
+    """
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Cloud Account ID", "Cloud Asset ID", "Finding"])
+        for row in range(rows):
+            index = row % unique_buckets
+            asset_format = ASSET_ID_FORMATS[(row // unique_buckets) % len(ASSET_ID_FORMATS)]
+            writer.writerow([backend.project_id(index), asset_format.format(backend.bucket_name(index)),
+                             f"finding-{row}"])
+
+
+def run_investigation(mode, rows, args):
+    """
+    Run investigate_buckets against the fake backend in the current process.
+
+    Returns:
+        dict: Throughput, API call and memory figures for the run.
+    """
+    import investigate_gcpstoragebucket_publicread as investigation
+
+    logging.getLogger().setLevel(logging.WARNING)
+    unique_buckets = max(1, rows // args.duplication)
+    backend = FakeGcpBackend(bucket_count=unique_buckets, project_count=args.projects, server=make_server(args),
+                             object_count=args.objects)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_csv = os.path.join(work_dir, "findings.csv")
+        write_synthetic_csv(input_csv, rows, unique_buckets, backend)
+
+        start = time.perf_counter()
+        investigation.investigate_buckets(
+            None, input_csv,
+            os.path.join(work_dir, "public_bucket_read_investigation.jsonl"),
+            os.path.join(work_dir, "public_bucket_read_investigation.json"),
+            os.path.join(work_dir, "summary_table.csv"),
+            concurrency=1 if mode == "serial" else args.concurrency,
+            bulk_list=mode == "bulk",
+            max_rps=args.max_rps,
+            backend=backend,
+            deep_scan=mode == "deep",
+            object_sample_rate=args.object_sample_rate)
+        seconds = time.perf_counter() - start
+
+    api_calls = sum(backend.server.calls.values())
+    return {
+        "scenario": mode,
+        "rows": rows,
+        "unique_buckets": unique_buckets,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1),
+        "api_calls": api_calls,
+        "api_calls_per_bucket": round(api_calls / unique_buckets, 3),
+        "api_errors": sum(backend.server.errors.values()),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_provisioning(rows, args):
+    """
+    Run the deploy script's manifest provisioning against the fake backend.
+
+    Returns:
+        dict: Throughput, API call and memory figures for the run.
+    """
+    import gcpstoragebucket_publicread as deploy
+
+    logging.getLogger().setLevel(logging.WARNING)
+    deploy.logger.setLevel(logging.WARNING)
+    backend = FakeGcpBackend(bucket_count=0, project_count=args.projects, server=make_server(args))
+    entries = [{"bucket_name": f"bench-new-bucket-{index}", "project_id": f"bench-project-{index % args.projects}",
+                "location": None} for index in range(rows)]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        results = deploy.create_buckets_from_manifest(
+            entries, concurrency=args.concurrency,
+            report_path=os.path.join(work_dir, "bucket_provisioning_report.json"), clients=backend)
+        seconds = time.perf_counter() - start
+
+    api_calls = sum(backend.server.calls.values())
+    return {
+        "scenario": "provision",
+        "rows": rows,
+        "unique_buckets": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1),
+        "api_calls": api_calls,
+        "api_calls_per_bucket": round(api_calls / rows, 3),
+        "api_errors": sum(1 for result in results if result["status"] == "failed"),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_scenario_subprocess(scenario, rows, args):
+    """Run one scenario in a fresh interpreter so that peak RSS is measured per scenario."""
+    command = [sys.executable, os.path.abspath(__file__), "--run-one", scenario, "--sizes", str(rows),
+               "--concurrency", str(args.concurrency), "--duplication", str(args.duplication),
+               "--projects", str(args.projects), "--latency-ms", str(args.latency_ms),
+               "--jitter-ms", str(args.jitter_ms), "--error-rate", str(args.error_rate),
+               "--max-rps", str(args.max_rps), "--seed", str(args.seed), "--objects", str(args.objects),
+               "--object-sample-rate", str(args.object_sample_rate)]
+    if args.quota_rps is not None:
+        command += ["--quota-rps", str(args.quota_rps)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        logger.error(f"Scenario {scenario} with {rows} rows failed:\n{completed.stderr}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the investigation and provisioning scripts against an in-process fake GCP backend.")
+    parser.add_argument("--sizes", type=str, default="1000,10000,100000",
+                        help="Comma-separated CSV row counts to benchmark (default: 1000,10000,100000).")
+    parser.add_argument("--scenarios", type=str, default="serial,parallel,bulk",
+                        help="Comma-separated scenarios: serial, parallel, bulk, deep and/or provision (default: serial,parallel,bulk).")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Worker count for the parallel, bulk and provision scenarios (default: 16).")
+    parser.add_argument("--duplication", type=int, default=2,
+                        help="Average number of CSV rows per bucket (default: 2).")
+    parser.add_argument("--projects", type=int, default=100,
+                        help="Number of synthetic projects (default: 100).")
+    parser.add_argument("--latency-ms", type=float, default=2.0,
+                        help="Simulated latency per API call in milliseconds (default: 2).")
+    parser.add_argument("--jitter-ms", type=float, default=0.0,
+                        help="Extra random latency per API call in milliseconds (default: 0).")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of API calls failing with 503 (default: 0).")
+    parser.add_argument("--quota-rps", type=float,
+                        help="Per-API calls per second before the fake answers 429 (default: unlimited).")
+    parser.add_argument("--max-rps", type=float, default=100000.0,
+                        help="Client-side per-API rate limit passed to the investigation (default: 100000).")
+    parser.add_argument("--objects", type=int, default=1000,
+                        help="Objects per synthetic bucket, listed by the deep scenario (default: 1000).")
+    parser.add_argument("--object-sample-rate", type=float, default=0.01,
+                        help="Object ACL sample rate of the deep scenario (default: 0.01).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for jitter and error injection (default: 0).")
+    parser.add_argument("--output", type=str, default="benchmark_results.json",
+                        help="Path of the JSON results file (default: benchmark_results.json).")
+    parser.add_argument("--run-one", type=str, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    if args.run_one:
+        if args.run_one == "provision":
+            result = run_provisioning(sizes[0], args)
+        else:
+            result = run_investigation(args.run_one, sizes[0], args)
+        print(json.dumps(result))
+        sys.exit(0)
+
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    unknown = set(scenarios) - set(INVESTIGATION_MODES) - {"provision"}
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = []
+    for rows in sizes:
+        for scenario in scenarios:
+            logger.warning(f"Running {scenario} with {rows} rows...")
+            result = run_scenario_subprocess(scenario, rows, args)
+            if result is not None:
+                results.append(result)
+
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=4)
+
+    print(tabulate(results, headers="keys", tablefmt="grid"))
+    print(f"\nResults saved to {args.output}")
@@ -0,0 +1,436 @@
+import random
+import threading
+import time
+from collections import Counter
+from google.api_core.exceptions import (Conflict, NotFound, NotModified, PreconditionFailed, ServiceUnavailable,
+                                        TooManyRequests)
+
+BUCKET_PREFIX = "bench-bucket-"
+PROJECT_PREFIX = "bench-project-"
+ORGANIZATION_ID = "100000000001"
+LEAF_FOLDER_COUNT = 10
+ROOT_FOLDER_ID = "200000000000"
+PUBLIC_MEMBERS = {"allUsers", "allAuthenticatedUsers"}
+
+
+class FakeApiServer:
+    """
+    Behaviour shared by every fake client: latency, error injection, quota and call counts.
+
+    Args:
+        latency (float): Seconds each call sleeps for.
+        jitter (float): Extra random latency in seconds, uniformly distributed in [0, jitter].
+        error_rate (float): Probability that a call fails with 503 Service Unavailable.
+        quota_rps (float): Calls per second allowed per API before 429 Too Many Requests is raised.
+        seed (int): Seed for the jitter and error injection random generator.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, quota_rps=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_rps = quota_rps
+        self.calls = Counter()
+        self.errors = Counter()
+        self._random = random.Random(seed)
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def handle(self, api):
+        """
+        Account for one call to `api`, sleeping and raising as configured.
+
+        Args:
+            api (str): API method name, e.g. `storage.buckets.get`.
+        """
+        with self._lock:
+            self.calls[api] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            error = None
+            if self.quota_rps is not None:
+                now = time.monotonic()
+                window_start, count = self._windows.get(api, (now, 0))
+                if now - window_start >= 1.0:
+                    window_start, count = now, 0
+                self._windows[api] = (window_start, count + 1)
+                if count + 1 > self.quota_rps:
+                    error = TooManyRequests(f"Quota exceeded for {api}.")
+            if error is None and self.error_rate and self._random.random() < self.error_rate:
+                error = ServiceUnavailable(f"Injected failure for {api}.")
+            if error is not None:
+                self.errors[api] += 1
+
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            raise error
+
+
+class FakePolicy:
+    def __init__(self, bindings, etag="BwX="):
+        self.bindings = bindings
+        self.etag = etag
+        self.version = 3
+
+    def to_api_repr(self):
+        return {
+            "bindings": [{"role": binding["role"], "members": sorted(binding["members"])}
+                         for binding in self.bindings],
+            "etag": self.etag,
+            "version": self.version,
+        }
+
+
+class FakeIamConfiguration:
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    @property
+    def public_access_prevention(self):
+        return self.bucket._properties.get("iamConfiguration", {}).get("publicAccessPrevention")
+
+    @public_access_prevention.setter
+    def public_access_prevention(self, value):
+        self.bucket._pending_public_access_prevention = value
+
+
+class FakeBucket:
+    def __init__(self, backend, name, properties=None):
+        self.backend = backend
+        self.name = name
+        self._properties = properties or {"name": name}
+        self._pending_public_access_prevention = None
+
+    @property
+    def metageneration(self):
+        metageneration = self._properties.get("metageneration")
+        return int(metageneration) if metageneration is not None else None
+
+    @property
+    def iam_configuration(self):
+        return FakeIamConfiguration(self)
+
+    def blob(self, blob_name):
+        return FakeBlob(self.backend, self.name, blob_name)
+
+    def patch(self, if_metageneration_match=None, **kwargs):
+        self.backend.server.handle("storage.buckets.patch")
+        if if_metageneration_match is not None and \
+                str(if_metageneration_match) != self.backend.bucket_properties(self.name)["metageneration"]:
+            raise PreconditionFailed(f"Bucket {self.name} metageneration does not match.")
+        if self._pending_public_access_prevention is not None:
+            self.backend.set_public_access_prevention(self.name, self._pending_public_access_prevention)
+            self._pending_public_access_prevention = None
+        self._properties = self.backend.bucket_properties(self.name)
+
+    def reload(self, if_metageneration_not_match=None, **kwargs):
+        self.backend.server.handle("storage.buckets.get")
+        properties = self.backend.bucket_properties(self.name)
+        if if_metageneration_not_match is not None and \
+                str(if_metageneration_not_match) == properties["metageneration"]:
+            raise NotModified(f"Bucket {self.name} not modified.")
+        self._properties = properties
+
+    def get_iam_policy(self, requested_policy_version=None, **kwargs):
+        self.backend.server.handle("storage.buckets.getIamPolicy")
+        return FakePolicy(self.backend.bucket_bindings(self.name),
+                          etag=self.backend.bucket_properties(self.name)["etag"])
+
+    def set_iam_policy(self, policy, **kwargs):
+        self.backend.server.handle("storage.buckets.setIamPolicy")
+        properties = self.backend.bucket_properties(self.name)
+        if policy.etag is not None and policy.etag != properties["etag"]:
+            raise PreconditionFailed(f"IAM policy of bucket {self.name} changed since it was read.")
+        # Like GCS, public members are refused with 412 while public access
+        # prevention is enforced.
+        if properties["iamConfiguration"]["publicAccessPrevention"] == "enforced" and any(
+                PUBLIC_MEMBERS & set(binding["members"]) for binding in policy.bindings):
+            raise PreconditionFailed(
+                f"Public members are not allowed on bucket {self.name}: public access prevention is enforced.")
+        self.backend.set_bucket_bindings(self.name, policy.bindings)
+        return policy
+
+    def make_public(self, recursive=False, future=False, **kwargs):
+        self.backend.server.handle("storage.buckets.patch")
+        if recursive:
+            self.backend.server.handle("storage.objects.list")
+
+
+class FakeObjectAcl:
+    def __init__(self, backend, bucket_name, object_name):
+        self.backend = backend
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self._entries = None
+
+    def reload(self, **kwargs):
+        self.backend.server.handle("storage.objectAccessControls.list")
+        self._entries = self.backend.object_acl(self.bucket_name, self.object_name)
+
+    def __iter__(self):
+        if self._entries is None:
+            self.reload()
+        return iter(self._entries)
+
+
+class FakeBlob:
+    def __init__(self, backend, bucket_name, name):
+        self.name = name
+        self.acl = FakeObjectAcl(backend, bucket_name, name)
+
+
+class FakePage(list):
+    pass
+
+
+class FakeBlobIterator:
+    def __init__(self, backend, bucket_name, page_token=None, page_size=None):
+        self.backend = backend
+        self.bucket_name = bucket_name
+        self.next_page_token = page_token
+        self.page_size = page_size or 1000
+
+    @property
+    def pages(self):
+        start = int(self.next_page_token or 0)
+        total = self.backend.object_count_for(self.bucket_name)
+        while True:
+            self.backend.server.handle("storage.objects.list")
+            end = min(start + self.page_size, total)
+            self.next_page_token = str(end) if end < total else None
+            yield FakePage(FakeBlob(self.backend, self.bucket_name, self.backend.object_name(index))
+                           for index in range(start, end))
+            if self.next_page_token is None:
+                return
+            start = end
+
+
+class FakeStorageClient:
+    def __init__(self, backend, project=None):
+        self.backend = backend
+        self.project = project
+
+    def bucket(self, bucket_name):
+        return FakeBucket(self.backend, bucket_name)
+
+    def list_blobs(self, bucket_or_name, page_token=None, page_size=None, **kwargs):
+        bucket_name = getattr(bucket_or_name, "name", bucket_or_name)
+        self.backend.bucket_properties(bucket_name)
+        return FakeBlobIterator(self.backend, bucket_name, page_token, page_size)
+
+    def create_bucket(self, bucket_or_name, location=None, **kwargs):
+        self.backend.server.handle("storage.buckets.insert")
+        name = getattr(bucket_or_name, "name", bucket_or_name)
+        self.backend.add_bucket(name, self.project, location)
+        return FakeBucket(self.backend, name, self.backend.bucket_properties(name))
+
+    def list_buckets(self, project=None, page_size=None, **kwargs):
+        page_size = page_size or 1000
+        for page_index, name in enumerate(self.backend.project_buckets(project or self.project)):
+            if page_index % page_size == 0:
+                self.backend.server.handle("storage.buckets.list")
+            yield FakeBucket(self.backend, name, self.backend.bucket_properties(name))
+
+
+class FakeResource:
+    def __init__(self, name, parent, project_id=None):
+        self.name = name
+        self.parent = parent
+        self.project_id = project_id
+
+
+class FakeProjectsClient:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_project(self, name=None, **kwargs):
+        self.backend.server.handle("resourcemanager.projects.get")
+        return FakeResource(name, self.backend.project_parent(name.split("/")[-1]))
+
+    def list_projects(self, parent=None, **kwargs):
+        self.backend.server.handle("resourcemanager.projects.list")
+        for project_id in self.backend.child_projects(parent):
+            yield FakeResource(f"projects/{project_id}", parent, project_id)
+
+
+class FakeFoldersClient:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_folder(self, name=None, **kwargs):
+        self.backend.server.handle("resourcemanager.folders.get")
+        return FakeResource(name, self.backend.folder_parent(name.split("/")[-1]))
+
+    def list_folders(self, parent=None, **kwargs):
+        self.backend.server.handle("resourcemanager.folders.list")
+        for folder_id in self.backend.child_folders(parent):
+            yield FakeResource(f"folders/{folder_id}", parent)
+
+
+class FakeGcpBackend:
+    """
+    In-process stand-in for the storage, IAM and Resource Manager APIs.
+
+    Synthetic buckets `bench-bucket-<i>` for i < bucket_count are derived from their
+    index instead of being stored, so large fleets cost no memory: bucket i lives in
+    project `bench-project-<i % project_count>`, every fourth bucket grants
+    roles/storage.objectViewer to allUsers and every tenth (offset 1) grants
+    roles/storage.legacyBucketReader to allAuthenticatedUsers. Projects sit in one of
+    ten folders under a root folder in a single organization. Every synthetic bucket
+    holds `object_count` objects `object-<j>`; in fine-grained buckets (every third,
+    without uniform bucket-level access) object j is readable by allUsers through
+    its ACL when (i + j) % 100 == 0. Buckets created through the fake (e.g. by the
+    deploy script) are kept in memory.
+
+    The object exposes the same `storage_client`, `projects_client` and `folders_client`
+    methods as GcpClientFactory in ../Common/gcp_clients.py, so it can be passed to
+    investigate_buckets as `backend`.
+
+    Args:
+        bucket_count (int): Number of synthetic buckets.
+        project_count (int): Number of synthetic projects the buckets are spread over.
+        server (FakeApiServer): Latency, error and quota behaviour; defaults to no latency.
+        object_count (int): Number of synthetic objects in every synthetic bucket.
+    """
+
+    def __init__(self, bucket_count=1000, project_count=100, server=None, object_count=0):
+        self.bucket_count = bucket_count
+        self.project_count = max(1, project_count)
+        self.object_count = object_count
+        self.server = server or FakeApiServer()
+        self._created = {}
+        self._bindings = {}
+        self._metagenerations = {}
+        self._public_access_prevention = {}
+        self._lock = threading.Lock()
+
+    def storage_client(self, project=None):
+        return FakeStorageClient(self, project)
+
+    def projects_client(self):
+        return FakeProjectsClient(self)
+
+    def folders_client(self):
+        return FakeFoldersClient(self)
+
+    @staticmethod
+    def bucket_name(index):
+        return f"{BUCKET_PREFIX}{index}"
+
+    def project_id(self, bucket_index):
+        return f"{PROJECT_PREFIX}{bucket_index % self.project_count}"
+
+    def _bucket_index(self, name):
+        if name.startswith(BUCKET_PREFIX):
+            suffix = name[len(BUCKET_PREFIX):]
+            if suffix.isdigit() and int(suffix) < self.bucket_count:
+                return int(suffix)
+        return None
+
+    def add_bucket(self, name, project_id, location=None):
+        with self._lock:
+            if name in self._created or self._bucket_index(name) is not None:
+                raise Conflict(f"Bucket {name} already exists.")
+            self._created[name] = {"project": project_id, "location": location or "US"}
+
+    def bucket_properties(self, name):
+        index = self._bucket_index(name)
+        with self._lock:
+            created = self._created.get(name)
+        if index is None and created is None:
+            raise NotFound(f"Bucket {name} not found.")
+        fine_grained = index is not None and index % 3 == 0
+        with self._lock:
+            metageneration = self._metagenerations.get(name, 1)
+            public_access_prevention = self._public_access_prevention.get(name, "inherited")
+        return {
+            "kind": "storage#bucket",
+            "name": name,
+            "selfLink": f"https://www.googleapis.com/storage/v1/b/{name}",
+            "storageClass": "STANDARD",
+            "location": (created or {}).get("location", "US"),
+            "locationType": "multi-region",
+            "iamConfiguration": {
+                "uniformBucketLevelAccess": {"enabled": not fine_grained},
+                "publicAccessPrevention": public_access_prevention,
+            },
+            "metageneration": str(metageneration),
+            "etag": f"CA{metageneration}=",
+        }
+
+    def bucket_bindings(self, name):
+        with self._lock:
+            if name in self._bindings:
+                return [dict(binding, members=set(binding["members"])) for binding in self._bindings[name]]
+        index = self._bucket_index(name)
+        if index is None:
+            self.bucket_properties(name)
+            return []
+        bindings = [{"role": "roles/storage.admin", "members": {f"user:owner-{index % 7}@example.com"}}]
+        if index % 4 == 0:
+            bindings.append({"role": "roles/storage.objectViewer", "members": {"allUsers"}})
+        if index % 10 == 1:
+            bindings.append({"role": "roles/storage.legacyBucketReader",
+                             "members": {"allAuthenticatedUsers", "projectViewer:" + self.project_id(index)}})
+        return bindings
+
+    def set_bucket_bindings(self, name, bindings):
+        """Replace a bucket's IAM bindings, bumping its metageneration like GCS does."""
+        with self._lock:
+            self._bindings[name] = [dict(binding, members=set(binding["members"])) for binding in bindings]
+            self._metagenerations[name] = self._metagenerations.get(name, 1) + 1
+
+    @staticmethod
+    def object_name(index):
+        return f"object-{index}"
+
+    def object_count_for(self, bucket_name):
+        return self.object_count if self._bucket_index(bucket_name) is not None else 0
+
+    def object_acl(self, bucket_name, object_name):
+        index = self._bucket_index(bucket_name)
+        entries = [{"entity": f"user-owner-{index}@example.com", "role": "OWNER"}]
+        object_index = int(object_name.rsplit("-", 1)[-1])
+        if index is not None and index % 3 == 0 and (index + object_index) % 100 == 0:
+            entries.append({"entity": "allUsers", "role": "READER"})
+        return entries
+
+    def set_public_access_prevention(self, name, value):
+        """Set a bucket's public access prevention, bumping its metageneration."""
+        with self._lock:
+            self._public_access_prevention[name] = value
+            self._metagenerations[name] = self._metagenerations.get(name, 1) + 1
+
+    def project_buckets(self, project_id):
+        if project_id and project_id.startswith(PROJECT_PREFIX):
+            suffix = project_id[len(PROJECT_PREFIX):]
+            if suffix.isdigit():
+                yield from (self.bucket_name(index)
+                            for index in range(int(suffix), self.bucket_count, self.project_count))
+        with self._lock:
+            created = [name for name, bucket in self._created.items() if bucket["project"] == project_id]
+        yield from created
+
+    def project_parent(self, project_id):
+        suffix = project_id[len(PROJECT_PREFIX):] if project_id.startswith(PROJECT_PREFIX) else ""
+        if not suffix.isdigit():
+            raise NotFound(f"Project {project_id} not found.")
+        return f"folders/{int(ROOT_FOLDER_ID) + 1 + int(suffix) % LEAF_FOLDER_COUNT}"
+
+    def folder_parent(self, folder_id):
+        if folder_id == ROOT_FOLDER_ID:
+            return f"organizations/{ORGANIZATION_ID}"
+        return f"folders/{ROOT_FOLDER_ID}"
+
+    def child_folders(self, parent):
+        if parent == f"organizations/{ORGANIZATION_ID}":
+            return [ROOT_FOLDER_ID]
+        if parent == f"folders/{ROOT_FOLDER_ID}":
+            return [str(int(ROOT_FOLDER_ID) + 1 + leaf) for leaf in range(LEAF_FOLDER_COUNT)]
+        return []
+
+    def child_projects(self, parent):
+        leaf = int(parent.split("/")[-1]) - int(ROOT_FOLDER_ID) - 1 if parent.startswith("folders/") else -1
+        if not 0 <= leaf < LEAF_FOLDER_COUNT:
+            return []
+        return [f"{PROJECT_PREFIX}{index}" for index in range(leaf, self.project_count, LEAF_FOLDER_COUNT)]
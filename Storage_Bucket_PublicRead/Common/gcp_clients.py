@@ -0,0 +1,323 @@
+import json
+import logging
+import sys
+import threading
+from datetime import datetime, timezone
+
+# The Google client libraries are imported where they are first needed, so that
+# importing this module does not slow down the scripts' start-up.
+
+logger = logging.getLogger(__name__)
+
+CLOUD_PLATFORM_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+RESOURCE_MANAGER_HOST = "cloudresourcemanager.googleapis.com:443"
+# urllib3 connection pool size used when the caller does not size it to its workers.
+DEFAULT_POOL_SIZE = 10
+# Access tokens are refreshed this many seconds before they expire.
+TOKEN_REFRESH_MARGIN = 300
+# Keep idle gRPC connections alive between bursts instead of reconnecting.
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.max_receive_message_length", -1),
+]
+
+
+def pool_size_for(workers, headroom=2):
+    """
+    Return the HTTP connection pool size for a number of concurrent workers.
+
+    Args:
+        workers (int): Threads issuing HTTP requests at the same time.
+        headroom (int): Extra connections for helper threads (prefetching, token refresh).
+
+    Returns:
+        int: Pool size, never below DEFAULT_POOL_SIZE.
+    """
+    return max(DEFAULT_POOL_SIZE, workers + headroom)
+
+
+def get_service_account_info(secret_name, secret_project_id, credentials=None):
+    """
+    Read a service account key from Secret Manager into memory.
+
+    Args:
+        secret_name (str): Secret holding the service account key JSON.
+        secret_project_id (str): Project containing the secret.
+        credentials (google.auth.credentials.Credentials): Credentials used to read the secret.
+
+    Returns:
+        dict: The parsed key; it is never written to disk.
+    """
+    from google.cloud import secretmanager
+
+    client = secretmanager.SecretManagerServiceClient(credentials=credentials)
+    name = f"projects/{secret_project_id}/secrets/{secret_name}/versions/latest"
+    response = client.access_secret_version(name=name)
+    logger.debug(f"Secret {secret_name} retrieved from project {secret_project_id}.")
+    return json.loads(response.payload.data.decode("UTF-8"))
+
+
+class CredentialProvider:
+    """
+    Non-interactive GCP credentials shared by every worker of a run.
+
+    The credentials are loaded once (Application Default Credentials, or a
+    service account key read from Secret Manager straight into memory) and are
+    handed to GcpClientFactory, whose pooled clients all use them. A daemon
+    thread refreshes the access token `refresh_margin` seconds before it
+    expires, so concurrent workers never block on, or race for, a refresh.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): The credentials to share.
+        project_id (str): Project the credentials belong to, if known.
+        refresh_margin (int): Seconds before expiry at which the token is refreshed.
+    """
+
+    def __init__(self, credentials, project_id=None, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.credentials = credentials
+        self.project_id = project_id
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._request = None
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_application_default(cls):
+        """Load Application Default Credentials without calling the gcloud CLI."""
+        import google.auth
+
+        credentials, project_id = google.auth.default(scopes=CLOUD_PLATFORM_SCOPES)
+        return cls(credentials, project_id)
+
+    @classmethod
+    def from_secret(cls, secret_name, secret_project_id, source=None):
+        """
+        Load a service account key from Secret Manager without writing it to disk.
+
+        Args:
+            secret_name (str): Secret holding the service account key JSON.
+            secret_project_id (str): Project containing the secret.
+            source (CredentialProvider): Credentials used to read the secret; defaults to ADC.
+
+        Returns:
+            CredentialProvider: Provider for the service account.
+        """
+        from google.oauth2 import service_account
+
+        source = source or cls.from_application_default()
+        service_account_info = get_service_account_info(
+            secret_name, secret_project_id, source.credentials)
+        credentials = service_account.Credentials.from_service_account_info(
+            service_account_info, scopes=CLOUD_PLATFORM_SCOPES)
+        return cls(credentials, service_account_info.get("project_id"))
+
+    def seconds_until_expiry(self):
+        """Return the seconds left on the current access token (0 if there is none)."""
+        expiry = self.credentials.expiry
+        if not self.credentials.token or expiry is None:
+            return 0.0
+        # google-auth keeps expiry as a naive UTC datetime.
+        return (expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+
+    def refresh_if_needed(self):
+        """
+        Refresh the access token if it expires within the refresh margin.
+
+        Returns:
+            bool: Whether the token was refreshed.
+        """
+        with self._lock:
+            if self.seconds_until_expiry() > self.refresh_margin:
+                return False
+            if self._request is None:
+                from google.auth.transport.requests import Request
+
+                self._request = Request()
+            self.credentials.refresh(self._request)
+            logger.debug(f"Access token refreshed, valid for {int(self.seconds_until_expiry())}s.")
+            return True
+
+    def _refresh_loop(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh_if_needed()
+                delay = max(self.seconds_until_expiry() - self.refresh_margin, 1.0)
+            except Exception as e:
+                logger.warning(f"Background token refresh failed: {e}")
+                delay = 10.0
+            self._stopped.wait(delay)
+
+    def start(self):
+        """Fetch the first token (failing fast on bad credentials) and start background refresh."""
+        self.refresh_if_needed()
+        threading.Thread(target=self._refresh_loop, name="token-refresher", daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop the background refresh."""
+        self._stopped.set()
+
+
+def load_credentials(auth_method=None, secret_name=None, secret_project_id=None, login=None):
+    """
+    Load credentials without prompting and start their background refresh.
+
+    Args:
+        auth_method (str): "oauth" or "secret"; defaults to "secret" when a secret name is given.
+        secret_name (str): Secret Manager secret holding the service account key JSON.
+        secret_project_id (str): Project containing the secret.
+        login (callable): Interactive login (e.g. `gcloud auth application-default login`), only
+            called when no Application Default Credentials exist and stdin is a terminal.
+
+    Returns:
+        CredentialProvider: Started provider whose credentials are shared by every client.
+
+    Raises:
+        google.auth.exceptions.DefaultCredentialsError: No credentials were found.
+    """
+    from google.auth.exceptions import DefaultCredentialsError
+
+    auth_method = auth_method or ("secret" if secret_name else "oauth")
+    logger.debug(f"Starting {auth_method} authentication.")
+    try:
+        source = CredentialProvider.from_application_default()
+    except DefaultCredentialsError:
+        if login is None or not sys.stdin.isatty():
+            raise
+        logger.info("No Application Default Credentials found. Starting gcloud login.")
+        login()
+        source = CredentialProvider.from_application_default()
+
+    if auth_method == "secret":
+        provider = CredentialProvider.from_secret(secret_name, secret_project_id, source)
+    else:
+        provider = source
+    return provider.start()
+
+
+class GcpClientFactory:
+    """
+    Long-lived GCP API clients sharing one pooled transport per protocol.
+
+    Every storage.Client (one per project) uses the same authorized HTTP session,
+    whose urllib3 pool holds `pool_size` keep-alive connections, so concurrent
+    workers reuse TLS connections instead of opening new ones. The Resource
+    Manager projects and folders clients share one gRPC channel. Clients are
+    created on first use and are safe to share between threads.
+
+    The scripts only rely on the `storage_client`, `projects_client` and
+    `folders_client` methods, so any object providing them (e.g. the in-process
+    fake in ../Benchmark/fake_gcp_backend.py) can be used instead.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): Credentials shared by every client;
+            Application Default Credentials are loaded when omitted.
+        pool_size (int): Maximum number of pooled HTTP connections (see pool_size_for).
+    """
+
+    def __init__(self, credentials=None, pool_size=DEFAULT_POOL_SIZE):
+        self.credentials = credentials
+        self.pool_size = pool_size
+        self._session = None
+        self._channel = None
+        self._storage_clients = {}
+        self._projects_client = None
+        self._folders_client = None
+        self._lock = threading.RLock()
+
+    def _credentials(self):
+        if self.credentials is None:
+            import google.auth
+
+            self.credentials, _ = google.auth.default(scopes=CLOUD_PLATFORM_SCOPES)
+        return self.credentials
+
+    def http_session(self):
+        """
+        Return the shared authorized HTTP session, creating it on first use.
+
+        Returns:
+            google.auth.transport.requests.AuthorizedSession: Session with a pool of `pool_size` connections.
+        """
+        with self._lock:
+            if self._session is None:
+                from google.auth.transport.requests import AuthorizedSession
+                from requests.adapters import HTTPAdapter
+
+                session = AuthorizedSession(self._credentials())
+                # Retries are left to the callers' own backoff.
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                                      max_retries=0, pool_block=False)
+                session.mount("https://", adapter)
+                self._session = session
+                logger.debug(f"HTTP session created with a pool of {self.pool_size} connections.")
+            return self._session
+
+    def grpc_channel(self):
+        """
+        Return the gRPC channel shared by the Resource Manager clients, creating it on first use.
+
+        Returns:
+            grpc.Channel: Channel to cloudresourcemanager.googleapis.com.
+        """
+        with self._lock:
+            if self._channel is None:
+                from google.cloud.resourcemanager_v3.services.projects.transports import ProjectsGrpcTransport
+
+                self._channel = ProjectsGrpcTransport.create_channel(
+                    RESOURCE_MANAGER_HOST, credentials=self._credentials(),
+                    scopes=CLOUD_PLATFORM_SCOPES, options=GRPC_CHANNEL_OPTIONS)
+            return self._channel
+
+    def storage_client(self, project=None):
+        """
+        Return the storage client for a project, creating it on first use.
+
+        Args:
+            project (str): Project used for project-scoped calls such as create_bucket.
+
+        Returns:
+            storage.Client: Client on the shared HTTP session.
+        """
+        with self._lock:
+            if project not in self._storage_clients:
+                from google.cloud import storage
+
+                self._storage_clients[project] = storage.Client(
+                    project=project, credentials=self._credentials(), _http=self.http_session())
+            return self._storage_clients[project]
+
+    def projects_client(self):
+        """Return the Resource Manager projects client on the shared gRPC channel."""
+        with self._lock:
+            if self._projects_client is None:
+                from google.cloud import resourcemanager_v3
+                from google.cloud.resourcemanager_v3.services.projects.transports import ProjectsGrpcTransport
+
+                self._projects_client = resourcemanager_v3.ProjectsClient(
+                    transport=ProjectsGrpcTransport(channel=self.grpc_channel()))
+            return self._projects_client
+
+    def folders_client(self):
+        """Return the Resource Manager folders client on the shared gRPC channel."""
+        with self._lock:
+            if self._folders_client is None:
+                from google.cloud import resourcemanager_v3
+                from google.cloud.resourcemanager_v3.services.folders.transports import FoldersGrpcTransport
+
+                self._folders_client = resourcemanager_v3.FoldersClient(
+                    transport=FoldersGrpcTransport(channel=self.grpc_channel()))
+            return self._folders_client
+
+    def close(self):
+        """Close the pooled HTTP connections and the gRPC channel."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            if self._channel is not None:
+                self._channel.close()
+            self._session = self._channel = None
+            self._storage_clients.clear()
+            self._projects_client = self._folders_client = None
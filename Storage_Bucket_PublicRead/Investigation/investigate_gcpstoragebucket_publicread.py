@@ -3,20 +3,100 @@ import json
 import subprocess
 import os
 import argparse
+import importlib.util
 import logging
-from google.cloud import storage
-from google.cloud import secretmanager
-from google.cloud import resourcemanager_v3
-from google.oauth2 import service_account
+import textwrap
+import threading
+import time
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import zlib
+from array import array
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import chain
+from functools import lru_cache
 from urllib.parse import urlparse
-import pandas as pd
 from tabulate import tabulate
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Common"))
+from gcp_clients import GcpClientFactory, load_credentials, pool_size_for  # noqa: E402
+
+# The Google client libraries (and pandas, for the optional pivot output) are
+# imported where they are first needed to keep start-up fast.
+
 # Configure logging
 DEFAULT_LOG_LEVEL = logging.INFO
 logging.basicConfig(level=DEFAULT_LOG_LEVEL,
                     format="%(asctime)s - %(levelname)s - %(message)s")
 
+DEFAULT_HIERARCHY_CACHE_TTL = 24 * 60 * 60
+HIERARCHY_PREFETCH_BATCH_SIZE = 500
+TERMINAL_SUMMARY_MAX_ROWS = 100
+GCS_API_HOSTS = {"storage.googleapis.com",
+                 "storage.cloud.google.com", "www.googleapis.com"}
+# JSON API and Cloud Asset paths whose next segment is the bucket name.
+GCS_BUCKET_PATH_PREFIXES = (("storage", "v1", "b"), ("projects", "_", "buckets"))
+# bucket.reload() and bucket.get_iam_policy() per bucket, get_project per project.
+API_CALLS_PER_BUCKET = 2
+# Bucket fields read by extract_bucket_details and the incremental state store,
+# used to trim bulk listings.
+BUCKET_LIST_FIELDS = "items(name,kind,selfLink,storageClass,iamConfiguration,locationType,metageneration,etag),nextPageToken"
+BUCKET_LIST_PAGE_SIZE = 1000
+DEFAULT_MAX_RPS = 50.0
+DEFAULT_MAX_RETRIES = 5
+MIN_API_RATE = 0.5
+BASE_RETRY_DELAY = 1.0
+# Fraction of the configured rate regained after each successful call.
+RATE_RECOVERY_STEP = 0.01
+RATE_SLOWDOWN_COOLDOWN = 1.0
+PROFILE_SLOWEST_PROJECTS = 10
+STATE_COMMIT_INTERVAL = 500
+# Finished bucket details kept in memory for later rows of the same bucket.
+DETAILS_CACHE_SIZE = 1000
+# Read-modify-write attempts when a bucket's IAM policy or metadata changes
+# between our read and our write (HTTP 412 on the etag/metageneration guard).
+REMEDIATION_CONFLICT_RETRIES = 5
+DEFAULT_REMEDIATION_JOURNAL = "public_bucket_read_remediation.jsonl"
+INDEX_INSERT_BATCH_SIZE = 1000
+DEFAULT_INDEX_DB = "public_bucket_read_index.db"
+# `query --group-by` values and the indexed column each one aggregates on.
+INDEX_GROUP_COLUMNS = {"organization": "organization_id", "folder": "folder_id",
+                       "project": "project_id", "bucket": "bucket_name",
+                       "role": "role", "member": "member", "run": "run_id"}
+PUBLIC_MEMBERS = frozenset({"allUsers", "allAuthenticatedUsers"})
+# Exposure scoring: a public binding scores its role's access level times the
+# member's reach, halved when the binding has an IAM condition. Buckets without
+# uniform bucket-level access add a bonus because object ACLs can widen access,
+# and enforced public access prevention blocks public bindings altogether.
+EXPOSURE_ROLE_SCORES = {
+    "roles/storage.admin": 100, "roles/storage.objectAdmin": 100,
+    "roles/storage.objectUser": 100, "roles/storage.objectCreator": 90,
+    "roles/storage.legacyBucketOwner": 100, "roles/storage.legacyBucketWriter": 90,
+    "roles/storage.legacyObjectOwner": 90,
+    "roles/storage.objectViewer": 70, "roles/storage.legacyObjectReader": 70,
+    "roles/storage.legacyBucketReader": 40,
+}
+EXPOSURE_DEFAULT_ROLE_SCORE = 50
+EXPOSURE_MEMBER_WEIGHTS = {"allUsers": 1.0, "allAuthenticatedUsers": 0.8}
+EXPOSURE_CONDITION_FACTOR = 0.5
+EXPOSURE_FINE_GRAINED_BONUS = 10
+# Object ACL roles found by the deep scan, scored like the equivalent IAM roles.
+EXPOSURE_OBJECT_ACL_ROLE_SCORES = {"READER": 70, "OWNER": 100}
+DEFAULT_OBJECT_SAMPLE_RATE = 0.01
+DEFAULT_OBJECT_SAMPLE_CAP = 1000
+OBJECT_LIST_PAGE_SIZE = 1000
+OBJECT_LIST_FIELDS = "items(name),nextPageToken"
+OBJECT_ACL_EXAMPLES = 10
+EXPOSURE_LEVELS = ((90, "Critical"), (60, "High"), (30, "Medium"), (1, "Low"))
+SUMMARY_FIELDNAMES = ["Folder Name/ID", "Project Name/ID",
+                      "Bucket Name", "Permissions", "Exposure Match",
+                      "Severity", "Exposure Level"]
+
 
 def run_gcloud_auth():
     try:
@@ -29,112 +109,589 @@ def run_gcloud_auth():
         exit(1)
 
 
-def authenticate_gcp(secret_name=None, secret_project_id=None):
-    logging.debug("Starting authentication process.")
-    logging.info("\n" + "*" * 40)
-    logging.info("*          GCP Authentication           *")
-    logging.info("*" * 40 + "\n")
-    logging.info("Select your authentication method:")
-    logging.info("1. GCP User OAuth authentication")
-    logging.info("2. GCP OAuth + Service Account from Secret Manager")
+def authenticate_gcp(auth_method=None, secret_name=None, secret_project_id=None):
+    auth_method = auth_method or ("secret" if secret_name else "oauth")
+    try:
+        provider = load_credentials(
+            auth_method, secret_name, secret_project_id, login=run_gcloud_auth)
+    except Exception as e:
+        logging.error(f"Error during {auth_method} authentication: {e}")
+        exit(1)
+
+    if auth_method == "secret":
+        logging.info(
+            "Authentication successful using Service Account from Secret Manager.")
+    else:
+        logging.info("Authentication successful using GCP User OAuth.")
+    return provider
+
+
+def extract_bucket_name(asset_id):
+    logging.debug(f"Extracting bucket name from asset ID: {asset_id}")
+    asset_id = asset_id.strip()
+    if asset_id.startswith(("https://", "http://", "gs://", "//")):
+        parsed = urlparse(asset_id)
+        host = parsed.netloc.lower()
+        path_parts = [part for part in parsed.path.split("/") if part]
+        if host.endswith(".storage.googleapis.com"):
+            return host[:-len(".storage.googleapis.com")]
+        if host in GCS_API_HOSTS:
+            # e.g. https://storage.googleapis.com/<bucket>/<object>,
+            # https://www.googleapis.com/storage/v1/b/<bucket> or the Cloud Asset
+            # name //storage.googleapis.com/projects/_/buckets/<bucket>. The
+            # prefixes are only matched at the start of the path, since object
+            # names may contain "b" or "buckets" segments.
+            for prefix in GCS_BUCKET_PATH_PREFIXES:
+                if len(path_parts) > len(prefix) and tuple(path_parts[:len(prefix)]) == prefix:
+                    return path_parts[len(prefix)].lower()
+            return path_parts[0].lower() if path_parts else host
+        return host if host else parsed.path.strip("/").lower()
+    if asset_id.startswith("projects/_/buckets/"):
+        return asset_id.split("/")[3].lower()
+    return asset_id.strip("/").lower()
 
-    auth_method = input("Enter your choice (1 or 2): ").strip()
-    temp_key_path = None
 
-    if auth_method == "1":
+def payload_size(result):
+    # Best-effort response size in bytes for the profile report.
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        return sum(payload_size(value) for value in result.values())
+    properties = getattr(result, "_properties", None)
+    if isinstance(properties, dict):
+        return len(json.dumps(properties, default=str))
+    if hasattr(result, "to_api_repr"):
+        return len(json.dumps(result.to_api_repr(), default=str))
+    if hasattr(type(result), "pb"):
         try:
-            logging.debug("Checking existing GCP User OAuth authentication.")
-            subprocess.run(["gcloud", "auth", "application-default",
-                           "print-access-token"], check=True, stdout=subprocess.DEVNULL)
-            logging.info("GCP User OAuth already authenticated.")
-            return None, None
-        except subprocess.CalledProcessError:
-            logging.debug(
-                "No existing OAuth authentication found. Starting new login.")
-            run_gcloud_auth()
-            return None, None
+            return type(result).pb(result).ByteSize()
+        except Exception:
+            return 0
+    return 0
+
+
+class StageStats:
+    def __init__(self):
+        self.latencies = array("d")
+        self.errors = 0
+        self.bytes = 0
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(count - 1, int(p / 100 * count))] * 1000, 3)
+
+        return {
+            "count": count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "total_s": round(sum(latencies), 3),
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "bytes": self.bytes,
+        }
+
+
+class RunProfiler:
+    """
+    Collects per-stage call counts, latencies, error rates and bytes for a run.
 
-    elif auth_method == "2":
+    Every GCP API call is recorded by the RequestScheduler under its API name;
+    CSV planning, summary writing and report generation are recorded as local
+    stages, and per-row time is also aggregated by project to spot slow ones.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages = {}
+        self._projects = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, error=False, nbytes=0):
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats()
+            stats.latencies.append(seconds)
+            stats.errors += bool(error)
+            stats.bytes += nbytes
+
+    def add_bytes(self, stage, nbytes):
+        with self._lock:
+            if stage in self._stages:
+                self._stages[stage].bytes += nbytes
+
+    def record_project(self, project_id, seconds):
+        with self._lock:
+            rows, total = self._projects.get(project_id, (0, 0.0))
+            self._projects[project_id] = (rows + 1, total + seconds)
+
+    @contextmanager
+    def stage(self, name, nbytes=0):
+        start = time.perf_counter()
+        error = False
         try:
-            logging.debug("Using Service Account from Secret Manager.")
-            if not secret_name or not secret_project_id:
-                secret_name = input(
-                    "Enter the name of your Secret Manager secret: ").strip()
-                secret_project_id = input(
-                    "Enter the project ID containing the secret: ").strip()
-
-            secret_client = secretmanager.SecretManagerServiceClient()
-            secret_path = f"projects/{secret_project_id}/secrets/{secret_name}/versions/latest"
-            response = secret_client.access_secret_version(name=secret_path)
-            service_account_info = response.payload.data.decode("UTF-8")
-
-            temp_key_path = "temp_service_account_key.json"
-            with open(temp_key_path, "w") as temp_key_file:
-                temp_key_file.write(service_account_info)
-
-            credentials = service_account.Credentials.from_service_account_file(
-                temp_key_path)
-            logging.info(
-                "\nAuthentication successful using Service Account from Secret Manager!")
-            return credentials, temp_key_path
-        except Exception as e:
-            logging.error(f"Error during Service Account retrieval: {e}")
-            if temp_key_path and os.path.exists(temp_key_path):
-                os.remove(temp_key_path)
-            exit(1)
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, error, nbytes)
 
-    else:
-        logging.error("Invalid choice. Exiting.")
-        if temp_key_path and os.path.exists(temp_key_path):
-            os.remove(temp_key_path)
-        exit(1)
+    def report(self):
+        with self._lock:
+            stages = {name: stats.summary()
+                      for name, stats in sorted(self._stages.items())}
+            slowest = sorted(self._projects.items(),
+                             key=lambda item: item[1][1], reverse=True)
+        return {
+            "wall_time_s": round(time.perf_counter() - self.started, 3),
+            "stages": stages,
+            "slowest_projects": [
+                {"project_id": project_id, "rows": rows,
+                    "total_s": round(total, 3), "avg_ms": round(total / rows * 1000, 3)}
+                for project_id, (rows, total) in slowest[:PROFILE_SLOWEST_PROJECTS]
+            ],
+        }
 
+    def write_report(self, output_profile_json, display_in_terminal=False):
+        report = self.report()
+        with open(output_profile_json, "w") as profile_file:
+            json.dump(report, profile_file, indent=4)
+        logging.info(f"Run profile saved to {output_profile_json}")
 
-def extract_bucket_name(asset_id):
-    logging.debug(f"Extracting bucket name from asset ID: {asset_id}")
-    if asset_id.startswith("https://") or asset_id.startswith("gs://"):
-        parsed = urlparse(asset_id)
-        return parsed.netloc if parsed.netloc else parsed.path
-    return asset_id
+        if display_in_terminal:
+            print(f"\nRun Profile ({report['wall_time_s']}s wall time):\n")
+            print(tabulate(
+                [{"Stage": name, **stats}
+                 for name, stats in report["stages"].items()],
+                headers="keys", tablefmt="grid"))
+            if report["slowest_projects"]:
+                print("\nSlowest Projects:\n")
+                print(tabulate(report["slowest_projects"],
+                      headers="keys", tablefmt="grid"))
 
 
-def get_project_hierarchy(project_id):
-    try:
+def profile_stage(profiler, name, nbytes=0):
+    return profiler.stage(name, nbytes) if profiler is not None else nullcontext()
+
+
+@lru_cache(maxsize=None)
+def api_error_types():
+    from google.api_core import exceptions
+    from requests.exceptions import ConnectionError as RequestsConnectionError
+
+    quota_errors = (exceptions.TooManyRequests, exceptions.ResourceExhausted)
+    retryable_errors = quota_errors + (
+        exceptions.InternalServerError, exceptions.BadGateway,
+        exceptions.ServiceUnavailable, exceptions.GatewayTimeout,
+        exceptions.DeadlineExceeded, ConnectionError, RequestsConnectionError)
+    return quota_errors, retryable_errors
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the request rate of a single API.
+
+    The rate is halved whenever the API reports a quota error and climbs back
+    towards `max_rate` in small steps after every successful call, so throughput
+    settles just under the quota ceiling.
+    """
+
+    def __init__(self, max_rate, min_rate=MIN_API_RATE):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.capacity = max(1.0, max_rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.slowed_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens +
+                                  (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self):
+        # Concurrent workers tend to hit the same quota error together; only
+        # halve the rate once per cooldown window.
+        with self._lock:
+            now = time.monotonic()
+            if now - self.slowed_at >= RATE_SLOWDOWN_COOLDOWN:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = min(self.tokens, 0)
+                self.slowed_at = now
+            return self.rate
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate +
+                            self.max_rate * RATE_RECOVERY_STEP)
+
+
+class RequestScheduler:
+    """
+    Shared scheduler for every GCP API call made by the investigation.
+
+    Each API gets its own token bucket. Retryable failures (429, 5xx, timeouts)
+    are retried with jittered exponential backoff, and quota errors also slow
+    down that API's token bucket. Call sites pass `retry=None` to the client
+    libraries so that retries are handled here only.
+    """
+
+    def __init__(self, max_rps=DEFAULT_MAX_RPS, max_retries=DEFAULT_MAX_RETRIES,
+                 base_delay=BASE_RETRY_DELAY, max_delay=60.0, profiler=None):
+        self.max_rps = max_rps
+        self.profiler = profiler
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, api):
+        with self._lock:
+            if api not in self._limiters:
+                self._limiters[api] = TokenBucket(self.max_rps)
+            return self._limiters[api]
+
+    def call(self, api, func, *args, **kwargs):
+        from google.api_core.exceptions import NotModified
+
+        quota_errors, retryable_errors = api_error_types()
+        limiter = self.limiter(api)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except NotModified:
+                # The expected answer to a conditional request, not a failure.
+                if self.profiler is not None:
+                    self.profiler.record(api, time.perf_counter() - start)
+                limiter.speed_up()
+                raise
+            except Exception as e:
+                if self.profiler is not None:
+                    self.profiler.record(api, time.perf_counter() - start, error=True)
+                if not isinstance(e, retryable_errors):
+                    raise
+                if isinstance(e, quota_errors):
+                    rate = limiter.slow_down()
+                    logging.warning(
+                        f"Quota error on {api}, rate is now {rate:.1f} requests/s.")
+                if attempt >= self.max_retries:
+                    raise
+                delay = random.uniform(
+                    0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                attempt += 1
+                logging.debug(
+                    f"Retrying {api} in {delay:.2f}s (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(delay)
+                continue
+            if self.profiler is not None:
+                self.profiler.record(
+                    api, time.perf_counter() - start, nbytes=payload_size(result))
+            limiter.speed_up()
+            return result
+
+
+class ProjectHierarchyResolver:
+    """
+    Resolves project -> folder -> organization hierarchy with a shared client.
+
+    Lookups are memoized in-process by project and folder ID, so rows that share a
+    `Cloud Account ID` cost a single `get_project` call. Folder chains are walked
+    to the organization one level at a time for a whole batch of projects, and
+    shared ancestors are fetched once. When `cache_path` is set, successful
+    lookups are persisted there and reused by later runs until `cache_ttl`
+    seconds have passed.
+    """
+
+    def __init__(self, backend=None, cache_path=None,
+                 cache_ttl=DEFAULT_HIERARCHY_CACHE_TTL, max_workers=8, scheduler=None):
+        self.backend = backend or GcpClientFactory()
+        self.scheduler = scheduler or RequestScheduler()
+        self.cache_path = cache_path
+        self.cache_ttl = cache_ttl
+        self.max_workers = max(1, max_workers)
+        self._projects_client = None
+        self._folders_client = None
+        self._client_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # project_id -> (parent, error); folder_id -> parent.
+        self._projects = {}
+        self._folders = {}
+        self._fetched_at = {}
+        self._load_cache()
+
+    @property
+    def projects_client(self):
+        with self._client_lock:
+            if self._projects_client is None:
+                self._projects_client = self.backend.projects_client()
+            return self._projects_client
+
+    @property
+    def folders_client(self):
+        with self._client_lock:
+            if self._folders_client is None:
+                self._folders_client = self.backend.folders_client()
+            return self._folders_client
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logging.warning(
+                f"Ignoring unreadable hierarchy cache {self.cache_path}: {e}")
+            return
+
+        now = time.time()
+        for kind, store in (("projects", self._projects), ("folders", self._folders)):
+            for resource_id, entry in cache.get(kind, {}).items():
+                if now - entry.get("fetched_at", 0) > self.cache_ttl:
+                    continue
+                if kind == "projects":
+                    store[resource_id] = (entry.get("parent"), None)
+                else:
+                    store[resource_id] = entry.get("parent")
+                self._fetched_at[(kind, resource_id)] = entry["fetched_at"]
+        logging.debug(
+            f"Loaded {len(self._projects)} projects and {len(self._folders)} folders from hierarchy cache {self.cache_path}")
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self._lock:
+            cache = {"projects": {}, "folders": {}}
+            for project_id, (parent, error) in self._projects.items():
+                if error is None:
+                    cache["projects"][project_id] = {
+                        "parent": parent,
+                        "fetched_at": self._fetched_at.get(("projects", project_id), time.time()),
+                    }
+            for folder_id, parent in self._folders.items():
+                if parent is not None:
+                    cache["folders"][folder_id] = {
+                        "parent": parent,
+                        "fetched_at": self._fetched_at.get(("folders", folder_id), time.time()),
+                    }
+
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, "w") as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temp_path, self.cache_path)
+        logging.debug(f"Hierarchy cache saved to {self.cache_path}")
+
+    def _fetch_project_parent(self, project_id):
         logging.debug(
             f"Fetching project hierarchy for project ID: {project_id}")
-        client = resourcemanager_v3.ProjectsClient()
-        project = client.get_project(name=f"projects/{project_id}")
-        folder_id = None
-        organization_id = None
+        try:
+            project = self.scheduler.call(
+                "resourcemanager.projects.get", self.projects_client.get_project,
+                name=f"projects/{project_id}", retry=None)
+            return project.parent, None
+        except Exception as e:
+            logging.error(
+                f"Error retrieving hierarchy for project {project_id}: {e}")
+            return None, str(e)
+
+    def _fetch_folder_parent(self, folder_id):
+        logging.debug(f"Fetching parent for folder ID: {folder_id}")
+        try:
+            folder = self.scheduler.call(
+                "resourcemanager.folders.get", self.folders_client.get_folder,
+                name=f"folders/{folder_id}", retry=None)
+            return folder.parent
+        except Exception as e:
+            logging.warning(
+                f"Error retrieving parent for folder {folder_id}: {e}")
+            return None
+
+    def list_children(self, parent):
+        # Lists the folders and projects directly under an organization or
+        # folder, and primes the caches with their parents so that discovered
+        # projects never need a get_project call.
+        try:
+            folder_ids = self.scheduler.call(
+                "resourcemanager.folders.list", lambda: [
+                    folder.name.split("/")[-1]
+                    for folder in self.folders_client.list_folders(parent=parent, retry=None)
+                ])
+            project_ids = self.scheduler.call(
+                "resourcemanager.projects.list", lambda: [
+                    project.project_id
+                    for project in self.projects_client.list_projects(parent=parent, retry=None)
+                ])
+        except Exception as e:
+            logging.warning(f"Error listing children of {parent}: {e}")
+            return [], []
+
+        now = time.time()
+        with self._lock:
+            for folder_id in folder_ids:
+                self._folders[folder_id] = parent
+                self._fetched_at[("folders", folder_id)] = now
+            for project_id in project_ids:
+                self._projects[project_id] = (parent, None)
+                self._fetched_at[("projects", project_id)] = now
+        logging.debug(
+            f"Found {len(folder_ids)} folders and {len(project_ids)} projects under {parent}")
+        return [f"folders/{folder_id}" for folder_id in folder_ids], project_ids
+
+    def _fetch_batch(self, fetch, resource_ids):
+        resource_ids = sorted(resource_ids)
+        if len(resource_ids) <= 1 or self.max_workers <= 1:
+            return dict(zip(resource_ids, map(fetch, resource_ids)))
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(resource_ids))) as executor:
+            return dict(zip(resource_ids, executor.map(fetch, resource_ids)))
 
-        parent = project.parent
-        if parent.startswith("folders/"):
+    def resolve_many(self, project_ids):
+        project_ids = set(project_ids)
+        with self._lock:
+            missing_projects = project_ids - self._projects.keys()
+
+        if missing_projects:
+            fetched = self._fetch_batch(
+                self._fetch_project_parent, missing_projects)
+            now = time.time()
+            with self._lock:
+                for project_id, (parent, error) in fetched.items():
+                    self._projects[project_id] = (parent, error)
+                    self._fetched_at[("projects", project_id)] = now
+
+        # Walk every folder chain up one level per batch until each reaches an
+        # organization (or a folder whose parent cannot be read). Chains that are
+        # partly known (e.g. primed by list_children below a folder root) resume
+        # at their first unknown ancestor.
+        with self._lock:
+            frontier = {self._first_unknown_folder(parent)
+                        for parent, _ in (self._projects[p] for p in project_ids)}
+        frontier.discard(None)
+        while frontier:
+            fetched = self._fetch_batch(self._fetch_folder_parent, frontier)
+            now = time.time()
+            with self._lock:
+                for folder_id, parent in fetched.items():
+                    self._folders[folder_id] = parent
+                    self._fetched_at[("folders", folder_id)] = now
+                frontier = {self._first_unknown_folder(parent)
+                            for parent in fetched.values()}
+            frontier.discard(None)
+
+        return {project_id: self._build_hierarchy(project_id) for project_id in project_ids}
+
+    def _first_unknown_folder(self, parent):
+        # Called with the lock held.
+        seen = set()
+        while parent and parent.startswith("folders/") and parent not in seen:
+            seen.add(parent)
             folder_id = parent.split("/")[-1]
-        elif parent.startswith("organizations/"):
-            organization_id = parent.split("/")[-1]
+            if folder_id not in self._folders:
+                return folder_id
+            parent = self._folders[folder_id]
+        return None
 
-        logging.info(
+    def resolve(self, project_id):
+        return self.resolve_many([project_id])[project_id]
+
+    def _build_hierarchy(self, project_id):
+        with self._lock:
+            parent, error = self._projects[project_id]
+            if error is not None:
+                return {
+                    "project_id": project_id,
+                    "folder_id": None,
+                    "organization_id": None,
+                    "error": error,
+                }
+
+            folder_id = None
+            organization_id = None
+            seen = set()
+            if parent and parent.startswith("folders/"):
+                folder_id = parent.split("/")[-1]
+            while parent and parent.startswith("folders/") and parent not in seen:
+                seen.add(parent)
+                parent = self._folders.get(parent.split("/")[-1])
+            if parent and parent.startswith("organizations/"):
+                organization_id = parent.split("/")[-1]
+
+        logging.debug(
             f"Retrieved hierarchy for project {project_id}: folder_id={folder_id}, organization_id={organization_id}")
         return {
             "project_id": project_id,
             "folder_id": folder_id,
             "organization_id": organization_id,
         }
-    except Exception as e:
-        logging.error(
-            f"Error retrieving hierarchy for project {project_id}: {e}")
-        return {
-            "project_id": project_id,
-            "folder_id": None,
-            "organization_id": None,
-            "error": str(e),
-        }
 
 
-def extract_bucket_details(bucket):
+def get_project_hierarchy(project_id, resolver=None):
+    if resolver is None:
+        resolver = ProjectHierarchyResolver()
+    return resolver.resolve(project_id)
+
+
+def prefetch_hierarchies(rows, resolver, batch_size=HIERARCHY_PREFETCH_BATCH_SIZE):
+    # Resolve the distinct projects of each batch of rows in one go before the
+    # rows are handed to the workers, so per-row lookups are cache hits.
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            resolver.resolve_many(
+                {r["Cloud Account ID"] for r in batch if r.get("Cloud Account ID")})
+            yield from batch
+            batch = []
+    if batch:
+        resolver.resolve_many(
+            {r["Cloud Account ID"] for r in batch if r.get("Cloud Account ID")})
+        yield from batch
+
+
+def public_bindings(bindings):
+    # The allUsers/allAuthenticatedUsers part of each binding, keeping its
+    # condition so that remediation and rollback can address the same binding.
+    result = []
+    for binding in bindings:
+        members = [
+            member for member in binding["members"] if member in PUBLIC_MEMBERS]
+        if members:
+            public_binding = {"role": binding["role"], "members": members}
+            if binding.get("condition"):
+                public_binding["condition"] = binding["condition"]
+            result.append(public_binding)
+    return result
+
+
+def extract_bucket_details(bucket, reload=True, scheduler=None):
     logging.debug(f"Extracting details for bucket: {bucket.name}")
+    scheduler = scheduler or RequestScheduler()
     try:
-        bucket.reload()
+        if reload:
+            scheduler.call("storage.buckets.get", bucket.reload, retry=None)
+            if scheduler.profiler is not None:
+                scheduler.profiler.add_bytes(
+                    "storage.buckets.get", payload_size(bucket))
         raw_metadata = bucket._properties
         metadata = {
             "kind": raw_metadata.get("kind"),
@@ -150,19 +707,10 @@ def extract_bucket_details(bucket):
         metadata = {"error": f"Failed to fetch metadata: {str(e)}"}
 
     try:
-        iam_policy = bucket.get_iam_policy(requested_policy_version=3)
-        iam_policy_dict = {
-            "bindings": [
-                {
-                    "role": binding["role"],
-                    "members": [
-                        member for member in binding["members"] if member in {"allUsers", "allAuthenticatedUsers"}
-                    ],
-                }
-                for binding in iam_policy.bindings
-                if any(member in {"allUsers", "allAuthenticatedUsers"} for member in binding["members"])
-            ]
-        }
+        iam_policy = scheduler.call(
+            "storage.buckets.getIamPolicy", bucket.get_iam_policy,
+            requested_policy_version=3, retry=None)
+        iam_policy_dict = {"bindings": public_bindings(iam_policy.bindings)}
         logging.debug(
             f"IAM policy for bucket {bucket.name}: {iam_policy_dict}")
     except Exception as e:
@@ -173,6 +721,148 @@ def extract_bucket_details(bucket):
     return {"metadata": metadata, "iam_policy": iam_policy_dict}
 
 
+def extract_bucket_details_incremental(bucket, previous, reload=True, scheduler=None):
+    # Setting a bucket's IAM policy bumps its metageneration, so a bucket whose
+    # metageneration matches the stored state is unchanged and its IAM policy is
+    # not fetched again. With a reload this is a conditional GET that answers
+    # 304 Not Modified for unchanged buckets.
+    from google.api_core.exceptions import NotModified
+
+    scheduler = scheduler or RequestScheduler()
+    if previous is None:
+        return extract_bucket_details(bucket, reload=reload, scheduler=scheduler), False
+
+    if reload:
+        try:
+            scheduler.call("storage.buckets.get", bucket.reload,
+                           if_metageneration_not_match=int(previous["metageneration"]), retry=None)
+            reload = False
+        except NotModified:
+            logging.debug(
+                f"Bucket {bucket.name} unchanged since metageneration {previous['metageneration']}.")
+            return previous["details"], True
+        except Exception as e:
+            logging.debug(
+                f"Conditional reload failed for bucket {bucket.name}, fetching full details: {e}")
+
+    if not reload and str(bucket._properties.get("metageneration")) == str(previous["metageneration"]):
+        return previous["details"], True
+    return extract_bucket_details(bucket, reload=reload, scheduler=scheduler), False
+
+
+def public_binding_set(details):
+    return {
+        (binding["role"], member)
+        for binding in details.get("iam_policy", {}).get("bindings", [])
+        for member in binding.get("members", [])
+    }
+
+
+class BucketStateStore:
+    """
+    Persistent per-bucket state for incremental (e.g. nightly) investigations.
+
+    A SQLite database keyed by bucket name remembers the last seen
+    metageneration, etag and filtered details of every bucket. Buckets whose
+    metageneration has not changed reuse the stored details, and every change in
+    public bindings is appended to the deltas JSONL file as `newly_public`,
+    `no_longer_public` or `bindings_changed`. Buckets whose details could not be
+    fetched are written as `error` and never compared with their stored bindings.
+    """
+
+    def __init__(self, path, deltas_jsonl, append=False):
+        self.path = path
+        self.deltas_jsonl = deltas_jsonl
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS bucket_state ("
+            "bucket_name TEXT PRIMARY KEY, project_id TEXT, metageneration TEXT, "
+            "etag TEXT, details TEXT, updated_at REAL)")
+        # A resumed run appends, since the buckets behind the interrupted run's
+        # deltas are already in the state store and are not diffed again.
+        self._deltas_file = open(
+            deltas_jsonl, "a" if append else "w", buffering=1)
+        self._pending_writes = 0
+        self._lock = threading.Lock()
+        self.counts = {"unchanged": 0, "newly_public": 0,
+                       "no_longer_public": 0, "bindings_changed": 0, "error": 0}
+
+    def get(self, bucket_name):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT metageneration, etag, details FROM bucket_state WHERE bucket_name = ?",
+                (bucket_name,)).fetchone()
+        if row is None:
+            return None
+        return {"metageneration": row[0], "etag": row[1], "details": json.loads(row[2])}
+
+    def update(self, bucket_name, project_id, bucket, details, previous, unchanged):
+        if unchanged:
+            with self._lock:
+                self.counts["unchanged"] += 1
+            return
+
+        if record_has_error({"details": details}):
+            # A failed lookup has no bindings to compare (diffing it would report
+            # a public bucket as no longer public) and is not remembered, so it
+            # is retried by the next run.
+            with self._lock:
+                self.counts["error"] += 1
+                self._deltas_file.write(json.dumps({
+                    "bucket_name": bucket_name,
+                    "project_id": project_id,
+                    "change": "error",
+                    "added": [],
+                    "removed": [],
+                    "details": details,
+                }) + "\n")
+            return
+
+        change = None
+        current_bindings = public_binding_set(details)
+        previous_bindings = public_binding_set(
+            previous["details"]) if previous else set()
+        if current_bindings and not previous_bindings:
+            change = "newly_public"
+        elif previous_bindings and not current_bindings:
+            change = "no_longer_public"
+        elif current_bindings != previous_bindings:
+            change = "bindings_changed"
+
+        with self._lock:
+            if change is not None:
+                self.counts[change] += 1
+                self._deltas_file.write(json.dumps({
+                    "bucket_name": bucket_name,
+                    "project_id": project_id,
+                    "change": change,
+                    "added": sorted(current_bindings - previous_bindings),
+                    "removed": sorted(previous_bindings - current_bindings),
+                    "details": details,
+                }) + "\n")
+            metageneration = bucket._properties.get("metageneration")
+            if metageneration is not None:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO bucket_state VALUES (?, ?, ?, ?, ?, ?)",
+                    (bucket_name, project_id, str(metageneration), bucket._properties.get("etag"),
+                     json.dumps(details), time.time()))
+                self._pending_writes += 1
+                if self._pending_writes >= STATE_COMMIT_INTERVAL:
+                    self._connection.commit()
+                    self._pending_writes = 0
+
+    def close(self):
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+            self._deltas_file.close()
+        logging.info(
+            f"Incremental run: {self.counts['unchanged']} buckets unchanged, {self.counts['newly_public']} newly public, "
+            f"{self.counts['no_longer_public']} no longer public, {self.counts['bindings_changed']} with changed bindings, "
+            f"{self.counts['error']} failed. "
+            f"Deltas saved to {self.deltas_jsonl}")
+
+
 def validate_csv(input_csv):
     required_headers = {"Cloud Account ID", "Cloud Asset ID"}
     try:
@@ -188,109 +878,1660 @@ def validate_csv(input_csv):
         exit(1)
 
 
-def generate_summary_table(results, output_table_csv, display_in_terminal=False):
-    summary_data = []
+class ExposureClassifier:
+    """
+    Exposure rules compiled into lookup tables and applied to whole record streams.
+
+    The score of every distinct (role, member, conditional) binding is computed
+    once and memoized, so reclassifying millions of historical bindings (see the
+    `reclassify` subcommand) costs a dictionary lookup each. A bucket's severity
+    (0-100) is its highest binding score plus the fine-grained ACL bonus, or 0
+    when public access prevention is enforced.
+    """
+
+    def __init__(self, role_scores=None, member_weights=None,
+                 default_role_score=EXPOSURE_DEFAULT_ROLE_SCORE,
+                 condition_factor=EXPOSURE_CONDITION_FACTOR,
+                 fine_grained_bonus=EXPOSURE_FINE_GRAINED_BONUS, levels=EXPOSURE_LEVELS):
+        self.role_scores = dict(role_scores or EXPOSURE_ROLE_SCORES)
+        self.member_weights = dict(member_weights or EXPOSURE_MEMBER_WEIGHTS)
+        self.default_role_score = default_role_score
+        self.condition_factor = condition_factor
+        self.fine_grained_bonus = fine_grained_bonus
+        # Severity -> level for every possible score, so levels are a list index.
+        self._levels = [
+            next((name for threshold, name in levels if score >= threshold), "None")
+            for score in range(101)
+        ]
+        self._binding_scores = {}
+
+    def _binding_score(self, role, member, conditional):
+        key = (role, member, conditional)
+        score = self._binding_scores.get(key)
+        if score is None:
+            score = self.role_scores.get(role, self.default_role_score) * \
+                self.member_weights.get(member, 0.0)
+            if conditional:
+                score *= self.condition_factor
+            score = self._binding_scores[key] = int(round(score))
+        return score
+
+    def classify(self, details):
+        iam_policy = details.get("iam_policy", {})
+        metadata = details.get("metadata", {})
+        bindings = iam_policy.get("bindings", [])
+        members = [
+            f"{binding['role']}: {', '.join(binding['members'])}"
+            for binding in bindings
+            if binding.get("members")
+        ]
+        score = 0
+        for binding in bindings:
+            conditional = bool(binding.get("condition"))
+            for member in binding.get("members", ()):
+                score = max(score, self._binding_score(
+                    binding["role"], member, conditional))
+        # Public object ACLs found by the deep scan count like bindings.
+        for entry in details.get("object_acls", {}).get("public_entities", []):
+            members.append(
+                f"object ACL {entry['role']}: {entry['entity']} ({entry['objects']} sampled objects)")
+            score = max(score, int(round(
+                EXPOSURE_OBJECT_ACL_ROLE_SCORES.get(entry["role"], self.default_role_score) *
+                self.member_weights.get(entry["entity"], 0.0))))
+
+        blocked = metadata.get("publicAccessPrevention") == "enforced"
+        if blocked:
+            score = 0
+        elif score and metadata.get("uniformBucketLevelAccess") is False:
+            score += self.fine_grained_bonus
+        severity = min(score, 100)
+
+        if not members:
+            # Bindings without members are reported, not silently dropped.
+            exposure_match = "Discrepancy" if bindings else "No"
+        elif blocked:
+            # Public grants that public access prevention keeps from taking effect.
+            exposure_match = "Discrepancy"
+        else:
+            exposure_match = "Yes"
+        return {
+            "permissions": members,
+            "exposure_match": exposure_match,
+            "severity": severity,
+            "level": self._levels[severity],
+        }
+
+
+def summary_row(record, classification=None):
+    if classification is None:
+        classification = ExposureClassifier().classify(record.get("details", {}))
+    return {
+        "Folder Name/ID": record.get("folder_id", "N/A"),
+        "Project Name/ID": record.get("project_id"),
+        "Bucket Name": record.get("bucket_name", "Unknown"),
+        "Permissions": "; ".join(classification["permissions"]) if classification["permissions"] else "None",
+        "Exposure Match": classification["exposure_match"],
+        "Severity": classification["severity"],
+        "Exposure Level": classification["level"],
+    }
+
+
+def generate_summary_table(records, output_table_csv, display_in_terminal=False, profiler=None,
+                           classifier=None):
+    classifier = classifier or ExposureClassifier()
+    preview = []
+    row_count = 0
+
+    with open(output_table_csv, mode="w", newline="") as csv_file:
+        writer = csv.DictWriter(
+            csv_file, fieldnames=SUMMARY_FIELDNAMES, lineterminator="\n")
+        writer.writeheader()
+        for record in records:
+            start = time.perf_counter()
+            row = summary_row(
+                record, classifier.classify(record.get("details", {})))
+            writer.writerow(row)
+            if profiler is not None:
+                profiler.record("summary.csv_row",
+                                time.perf_counter() - start)
+            row_count += 1
+            if display_in_terminal and len(preview) < TERMINAL_SUMMARY_MAX_ROWS:
+                preview.append(row)
 
-    for project_id, project_data in results.items():
-        folder_id = project_data.get("folder_id", "N/A")
-        for bucket in project_data.get("buckets", []):
-            bucket_name = bucket.get("bucket_name", "Unknown")
-            permissions = bucket.get("details", {}).get(
-                "iam_policy", {}).get("bindings", [])
-            metadata_permissions = [
-                f"{binding['role']}: {', '.join(binding['members'])}"
-                for binding in permissions
-                if binding.get("members")
-            ]
-            overly_permissive_bindings = bucket.get("details", {}).get(
-                "iam_policy", {}).get("bindings", [])
-            exposure_match = "Yes" if overly_permissive_bindings else "No"
-            if overly_permissive_bindings and not metadata_permissions:
-                exposure_match = "Discrepancy"
-
-            summary_data.append({
-                "Folder Name/ID": folder_id,
-                "Project Name/ID": project_id,
-                "Bucket Name": bucket_name,
-                "Permissions": "; ".join(metadata_permissions) if metadata_permissions else "None",
-                "Exposure Match": exposure_match
-            })
-
-    df = pd.DataFrame(summary_data)
-    df.to_csv(output_table_csv, index=False)
     logging.info(f"Summary table saved to {output_table_csv}")
 
     if display_in_terminal:
-        print("\nSummary Table:\n")
-        print(tabulate(summary_data, headers="keys", tablefmt="grid"))
+        with profile_stage(profiler, "summary.terminal"):
+            print("\nSummary Table:\n")
+            print(tabulate(preview, headers="keys", tablefmt="grid"))
+            if row_count > len(preview):
+                print(
+                    f"\n... {row_count - len(preview)} more rows in {output_table_csv}")
 
 
-def investigate_buckets(credentials, input_csv, output_json):
-    logging.debug("Starting bucket investigation.")
-    storage_client = storage.Client(credentials=credentials)
+def generate_summary_pivot(summary_table_csv, output_pivot_csv):
+    # Aggregated view: bucket counts per folder/project and Exposure Match value.
+    import pandas as pd
 
-    results = {}
-    with open(input_csv, mode="r") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            project_id = row.get("Cloud Account ID")
-            asset_id = row.get("Cloud Asset ID")
+    summary = pd.read_csv(summary_table_csv, dtype=str,
+                          keep_default_na=False)
+    pivot = summary.pivot_table(
+        index=["Folder Name/ID", "Project Name/ID"],
+        columns="Exposure Match", values="Bucket Name",
+        aggfunc="count", fill_value=0)
+    pivot.to_csv(output_pivot_csv)
+    logging.info(f"Summary pivot saved to {output_pivot_csv}")
 
-            if not project_id or not asset_id:
-                logging.warning(
-                    f"Skipping row with missing project or asset ID: {row}")
-                continue
 
-            hierarchy = get_project_hierarchy(project_id)
-            folder_id = hierarchy.get("folder_id")
-            organization_id = hierarchy.get("organization_id")
+class ExposureIndex:
+    """
+    Indexed SQLite copy of investigation results, kept across runs.
 
-            if project_id not in results:
-                results[project_id] = {
-                    "folder_id": folder_id,
-                    "organization_id": organization_id,
-                    "buckets": [],
-                }
+    Every run adds one row to `runs`, one row per bucket to `buckets` and one
+    row per public (role, member) pair to `bindings` (public object ACLs from
+    the deep scan as `object_acl:<role>` roles), each carrying the
+    organization, folder and project IDs so that filtered and grouped lookups
+    are answered from the indexes without reading the JSON report.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS runs ("
+        "run_id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL, source TEXT, "
+        "bucket_count INTEGER, exposed_count INTEGER)",
+        "CREATE TABLE IF NOT EXISTS buckets ("
+        "run_id INTEGER, organization_id TEXT, folder_id TEXT, project_id TEXT, "
+        "bucket_name TEXT, exposed INTEGER, error TEXT)",
+        "CREATE TABLE IF NOT EXISTS bindings ("
+        "run_id INTEGER, organization_id TEXT, folder_id TEXT, project_id TEXT, "
+        "bucket_name TEXT, role TEXT, member TEXT)",
+        "CREATE INDEX IF NOT EXISTS buckets_folder ON buckets (run_id, folder_id)",
+        "CREATE INDEX IF NOT EXISTS buckets_project ON buckets (run_id, project_id)",
+        "CREATE INDEX IF NOT EXISTS bindings_organization ON bindings (run_id, organization_id)",
+        "CREATE INDEX IF NOT EXISTS bindings_folder ON bindings (run_id, folder_id)",
+        "CREATE INDEX IF NOT EXISTS bindings_project ON bindings (run_id, project_id)",
+        "CREATE INDEX IF NOT EXISTS bindings_role ON bindings (run_id, role, member)",
+        "CREATE INDEX IF NOT EXISTS bindings_member ON bindings (run_id, member)",
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        for statement in self.SCHEMA:
+            self._connection.execute(statement)
+
+    def add_run(self, records, source=None):
+        with self._connection:
+            run_id = self._connection.execute(
+                "INSERT INTO runs (created_at, source) VALUES (?, ?)",
+                (time.time(), source)).lastrowid
+            bucket_rows, binding_rows = [], []
+            bucket_count = exposed_count = 0
+            # A bucket listed on several CSV rows has one record per row; it
+            # is indexed once per run.
+            seen = set()
+            for record in records:
+                key = (record.get("project_id"), record.get("bucket_name"))
+                if key in seen:
+                    continue
+                seen.add(key)
+                hierarchy = (run_id, record.get("organization_id"),
+                             record.get("folder_id"), record.get("project_id"),
+                             record.get("bucket_name"))
+                details = record.get("details", {})
+                bindings = [
+                    (binding["role"], member)
+                    for binding in details.get("iam_policy", {}).get("bindings", [])
+                    for member in binding.get("members", [])
+                ]
+                # Public object ACLs found by the deep scan are indexed as
+                # object_acl:<role> bindings of their entity.
+                bindings.extend(
+                    (f"object_acl:{entry['role']}", entry["entity"])
+                    for entry in details.get("object_acls", {}).get("public_entities", []))
+                bucket_rows.append(
+                    hierarchy + (int(bool(bindings)), record_error(record)))
+                binding_rows.extend(hierarchy + binding for binding in bindings)
+                bucket_count += 1
+                exposed_count += bool(bindings)
+                if len(bucket_rows) >= INDEX_INSERT_BATCH_SIZE:
+                    self._insert(bucket_rows, binding_rows)
+                    bucket_rows, binding_rows = [], []
+            self._insert(bucket_rows, binding_rows)
+            self._connection.execute(
+                "UPDATE runs SET bucket_count = ?, exposed_count = ? WHERE run_id = ?",
+                (bucket_count, exposed_count, run_id))
+        logging.info(
+            f"Run {run_id} indexed in {self.path}: {exposed_count} of {bucket_count} buckets exposed")
+        return run_id
+
+    def _insert(self, bucket_rows, binding_rows):
+        self._connection.executemany(
+            "INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?, ?)", bucket_rows)
+        self._connection.executemany(
+            "INSERT INTO bindings VALUES (?, ?, ?, ?, ?, ?, ?)", binding_rows)
+
+    def runs(self):
+        cursor = self._connection.execute(
+            "SELECT run_id, datetime(created_at, 'unixepoch'), source, bucket_count, exposed_count "
+            "FROM runs ORDER BY run_id")
+        return ["run_id", "created_at", "source", "buckets", "exposed"], cursor.fetchall()
+
+    def query(self, run="latest", filters=None, group_by=None, limit=None):
+        """
+        Filtered lookup of public bindings, optionally aggregated.
+
+        Args:
+            run: "latest", "all" or a run ID.
+            filters (dict): Column name to value, e.g. {"folder_id": "123", "member": "allUsers"}.
+            group_by (list): Keys of INDEX_GROUP_COLUMNS to aggregate on; rows are
+                individual bindings when empty.
+            limit (int): Maximum number of rows returned.
+
+        Returns:
+            tuple: Column headers and result rows.
+        """
+        clauses, params = [], []
+        if run == "latest":
+            clauses.append("run_id = (SELECT MAX(run_id) FROM runs)")
+        elif run != "all":
+            clauses.append("run_id = ?")
+            params.append(int(run))
+        for column, value in (filters or {}).items():
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        if group_by:
+            columns = [INDEX_GROUP_COLUMNS[key] for key in group_by]
+            headers = columns + ["buckets", "bindings"]
+            sql = (f"SELECT {', '.join(columns)}, COUNT(DISTINCT run_id || '/' || bucket_name), COUNT(*) "
+                   f"FROM bindings{where} GROUP BY {', '.join(columns)} "
+                   f"ORDER BY COUNT(*) DESC, {', '.join(columns)}")
+        else:
+            headers = ["run_id", "organization_id", "folder_id",
+                       "project_id", "bucket_name", "role", "member"]
+            sql = f"SELECT {', '.join(headers)} FROM bindings{where} ORDER BY run_id, project_id, bucket_name"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return headers, self._connection.execute(sql, params).fetchall()
+
+    def close(self):
+        self._connection.close()
+
+
+def write_exposure_index(input_jsonl, index_db, source=None):
+    index = ExposureIndex(index_db)
+    try:
+        return index.add_run(iter_jsonl_records(input_jsonl), source=source)
+    finally:
+        index.close()
+
+
+def run_query(argv):
+    parser = argparse.ArgumentParser(
+        prog="investigate_gcpstoragebucket_publicread.py query",
+        description="Query the exposure index written with --index-db.")
+    parser.add_argument("--index-db", type=str, default=DEFAULT_INDEX_DB,
+                        help=f"Path to the exposure index (default: {DEFAULT_INDEX_DB}).")
+    parser.add_argument("--run", type=str, default="latest",
+                        help="Run to query: latest, all or a run ID (default: latest).")
+    parser.add_argument("--organization", type=str, help="Only bindings in this organization ID.")
+    parser.add_argument("--folder", type=str, help="Only bindings in this folder ID.")
+    parser.add_argument("--project", type=str, help="Only bindings in this project ID.")
+    parser.add_argument("--bucket", type=str, help="Only bindings on this bucket.")
+    parser.add_argument("--role", type=str, help="Only this role, e.g. roles/storage.objectViewer.")
+    parser.add_argument("--member", type=str, help="Only this member, e.g. allUsers.")
+    parser.add_argument("--group-by", type=str,
+                        help=f"Comma-separated aggregation keys: {', '.join(INDEX_GROUP_COLUMNS)}.")
+    parser.add_argument("--list-runs", action="store_true",
+                        help="List the indexed runs instead of querying bindings.")
+    parser.add_argument("--limit", type=int, help="Maximum number of rows to print.")
+    parser.add_argument("--format", choices=["table", "csv", "json"], default="table",
+                        help="Output format (default: table).")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.index_db):
+        parser.error(f"Exposure index {args.index_db} does not exist; run with --index-db first.")
+    if args.run not in ("latest", "all") and not args.run.isdigit():
+        parser.error("--run must be latest, all or a run ID.")
+    group_by = [key.strip() for key in args.group_by.split(",")] if args.group_by else []
+    unknown = [key for key in group_by if key not in INDEX_GROUP_COLUMNS]
+    if unknown:
+        parser.error(f"Unknown --group-by keys: {', '.join(unknown)}")
+    filters = {column: value for column, value in (
+        ("organization_id", args.organization), ("folder_id", args.folder),
+        ("project_id", args.project), ("bucket_name", args.bucket),
+        ("role", args.role), ("member", args.member)) if value}
+
+    index = ExposureIndex(args.index_db)
+    try:
+        if args.list_runs:
+            headers, rows = index.runs()
+        else:
+            headers, rows = index.query(args.run, filters, group_by, args.limit)
+    finally:
+        index.close()
+
+    if args.format == "json":
+        print(json.dumps([dict(zip(headers, row)) for row in rows], indent=4))
+    elif args.format == "csv":
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        writer.writerow(headers)
+        writer.writerows(rows)
+    else:
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+
+
+def run_reclassify(argv):
+    parser = argparse.ArgumentParser(
+        prog="investigate_gcpstoragebucket_publicread.py reclassify",
+        description="Rebuild the summary table of a previous run with the current exposure rules, without any API calls.")
+    parser.add_argument("--jsonl", type=str, default="public_bucket_read_investigation.jsonl",
+                        help="Investigation records to reclassify (default: public_bucket_read_investigation.jsonl).")
+    parser.add_argument("--output", type=str, default="summary_table.csv",
+                        help="Path of the rebuilt summary table (default: summary_table.csv).")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.jsonl):
+        parser.error(f"Investigation records {args.jsonl} do not exist.")
+    generate_summary_table(iter_jsonl_records(args.jsonl), args.output)
+
+
+def process_row(fetcher, resolver, row, profiler=None):
+    start = time.perf_counter()
+    project_id = row.get("Cloud Account ID")
+    asset_id = row.get("Cloud Asset ID")
+
+    if not project_id or not asset_id:
+        logging.warning(
+            f"Skipping row with missing project or asset ID: {row}")
+        return None
+
+    hierarchy = get_project_hierarchy(project_id, resolver)
+    record = {
+        "project_id": project_id,
+        "folder_id": hierarchy.get("folder_id"),
+        "organization_id": hierarchy.get("organization_id"),
+    }
+
+    try:
+        bucket_name = extract_bucket_name(asset_id)
+        bucket_details = fetcher.get(bucket_name, project_id)
+        logging.info(
+            f"Successfully processed bucket: {bucket_name} in project: {project_id}")
+        record["bucket_name"] = bucket_name
+        record["details"] = bucket_details
+
+    except Exception as e:
+        logging.error(
+            f"Error processing bucket {bucket_name} in project {project_id}: {e}")
+        record["bucket_name"] = bucket_name
+        record["error"] = str(e)
+
+    if profiler is not None:
+        profiler.record_project(project_id, time.perf_counter() - start)
+    return record
+
+
+def iter_investigation_records(fetcher, resolver, rows, concurrency=1, profiler=None):
+    if concurrency <= 1:
+        for row in rows:
+            record = process_row(fetcher, resolver, row, profiler)
+            if record is not None:
+                yield record
+        return
+
+    # Keep a bounded window of in-flight rows and yield them in input order,
+    # so the output is identical to the serial run.
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        for row in rows:
+            pending.append(executor.submit(process_row, fetcher, resolver, row, profiler))
+            if len(pending) >= concurrency * 2:
+                record = pending.popleft().result()
+                if record is not None:
+                    yield record
+        while pending:
+            record = pending.popleft().result()
+            if record is not None:
+                yield record
+
+
+def write_jsonl_records(records, output_jsonl, append=False, profiler=None):
+    # Line-buffered so every finished bucket is on disk before the next one starts.
+    with open(output_jsonl, "a" if append else "w", buffering=1) as jsonl_file:
+        for record in records:
+            start = time.perf_counter()
+            line = json.dumps(record) + "\n"
+            jsonl_file.write(line)
+            if profiler is not None:
+                profiler.record("output.jsonl_record", time.perf_counter() - start,
+                                nbytes=len(line))
+            yield record
+    logging.info(f"Investigation records saved to {output_jsonl}")
+
+
+def iter_jsonl_records(input_jsonl):
+    with open(input_jsonl, "r") as jsonl_file:
+        for line in jsonl_file:
+            if line.strip():
+                yield json.loads(line)
 
+
+def record_has_error(record):
+    details = record.get("details", {})
+    return ("error" in record
+            or "error" in details.get("metadata", {})
+            or "error" in details.get("iam_policy", {}))
+
+
+def record_error(record):
+    # First error message of a record, top level before the details.
+    if not record_has_error(record):
+        return None
+    details = record.get("details", {})
+    return (record.get("error")
+            or details.get("metadata", {}).get("error")
+            or details.get("iam_policy", {}).get("error"))
+
+
+def load_checkpoint(output_jsonl):
+    # The JSONL output doubles as the checkpoint log. Keep the records that
+    # finished cleanly, and drop a partially written last line and any errored
+    # records so that they are investigated again. Finished records are counted
+    # per (project, bucket), since a bucket listed on several rows has one
+    # record per row.
+    completed = Counter()
+    if not os.path.exists(output_jsonl):
+        return completed
+
+    dropped = 0
+    temp_path = f"{output_jsonl}.tmp"
+    with open(output_jsonl, "r") as jsonl_file, open(temp_path, "w") as temp_file:
+        for line in jsonl_file:
+            if not line.strip():
+                continue
             try:
-                bucket_name = extract_bucket_name(asset_id)
-                bucket = storage_client.bucket(bucket_name)
-                bucket_details = extract_bucket_details(bucket)
-                logging.info(
-                    f"Successfully processed bucket: {bucket_name} in project: {project_id}")
-                results[project_id]["buckets"].append({
-                    "bucket_name": bucket_name,
-                    "details": bucket_details,
+                if not line.endswith("\n"):
+                    raise ValueError("incomplete record")
+                record = json.loads(line)
+            except ValueError:
+                dropped += 1
+                continue
+            if record_has_error(record):
+                dropped += 1
+                continue
+            completed[(record["project_id"], record["bucket_name"])] += 1
+            temp_file.write(line)
+    os.replace(temp_path, output_jsonl)
+
+    logging.info(
+        f"Resuming from {output_jsonl}: {sum(completed.values())} rows ({len(completed)} buckets) already investigated, "
+        f"{dropped} records will be retried.")
+    return completed
+
+
+def shard_of(project_id, shards):
+    # crc32 rather than hash(), which is salted per process, so every process
+    # and machine puts a project in the same shard.
+    return zlib.crc32(project_id.encode("utf-8")) % shards
+
+
+def shard_path(path, shard_index, shards):
+    root, extension = os.path.splitext(path)
+    return f"{root}.shard-{shard_index}-of-{shards}{extension}"
+
+
+def row_work_key(row):
+    project_id = row.get("Cloud Account ID")
+    asset_id = row.get("Cloud Asset ID")
+    if not project_id or not asset_id:
+        return None
+    return project_id, extract_bucket_name(asset_id)
+
+
+class BucketWorkPlan:
+    """
+    Normalized, de-duplicated work set for an input CSV.
+
+    Built in one pass before any API call goes out: every row's asset ID is
+    normalized to a bucket name and the rows referencing each bucket are counted,
+    so each bucket is investigated once and its details are fanned back out to
+    all of its rows.
+
+    With `shard=(index, count)` only the rows whose project hashes to that shard
+    are planned and passed on; rows with missing IDs go to shard 0 so that they
+    are reported once.
+    """
+
+    def __init__(self, completed=None, shard=None):
+        self.completed = completed or Counter()
+        self.shard = shard
+        self.row_count = 0
+        self.other_shard_count = 0
+        self.invalid_count = 0
+        self.completed_count = 0
+        self._planned_completed = Counter()
+        self.references = {}
+        self.projects = set()
+
+    @classmethod
+    def from_csv(cls, input_csv, completed=None, shard=None):
+        plan = cls(completed, shard)
+        with open(input_csv, mode="r") as file:
+            for row in csv.DictReader(file):
+                plan.add(row)
+        plan.log_summary()
+        return plan
+
+    def in_shard(self, row):
+        if self.shard is None:
+            return True
+        shard_index, shards = self.shard
+        if row_work_key(row) is None:
+            return shard_index == 0
+        return shard_of(row["Cloud Account ID"], shards) == shard_index
+
+    def add(self, row):
+        self.row_count += 1
+        if not self.in_shard(row):
+            self.other_shard_count += 1
+            return
+        key = row_work_key(row)
+        if key is None:
+            self.invalid_count += 1
+        elif self.completed[key] > self._planned_completed[key]:
+            self._planned_completed[key] += 1
+            self.completed_count += 1
+        else:
+            project_id, bucket_name = key
+            self.references[bucket_name] = self.references.get(
+                bucket_name, 0) + 1
+            self.projects.add(project_id)
+
+    def iter_rows(self, rows):
+        # As many rows of each bucket as finished in a previous run are dropped;
+        # rows with missing IDs are passed through so process_row reports them.
+        skipped = Counter()
+        for row in rows:
+            if not self.in_shard(row):
+                continue
+            key = row_work_key(row)
+            if key is not None and skipped[key] < self.completed[key]:
+                skipped[key] += 1
+                continue
+            yield row
+
+    @property
+    def pending_rows(self):
+        return sum(self.references.values())
+
+    @property
+    def saved_api_calls(self):
+        return ((self.pending_rows - len(self.references)) * API_CALLS_PER_BUCKET
+                + self.pending_rows - len(self.projects))
+
+    def log_summary(self):
+        if self.shard is not None:
+            logging.info(
+                f"Shard {self.shard[0]} of {self.shard[1]}: leaving {self.other_shard_count} rows to the other shards.")
+        if self.completed_count:
+            logging.info(
+                f"Skipping {self.completed_count} rows completed in a previous run.")
+        logging.info(
+            f"Planned {self.pending_rows} rows: {len(self.references)} unique buckets across "
+            f"{len(self.projects)} projects ({self.saved_api_calls} API calls saved by de-duplication).")
+
+
+class ProjectBucketLister:
+    """
+    Fills in bucket metadata for a whole project with one paginated listing.
+
+    `list_buckets(project=...)` is called at most once per project, restricted to
+    the fields that `extract_bucket_details` reads, and only the buckets flagged
+    in the plan are kept (all of them when `bucket_names` is None). Buckets that
+    are not found in their project's listing (or projects that cannot be listed)
+    fall back to a per-bucket reload.
+    """
+
+    def __init__(self, storage_client, bucket_names, scheduler=None):
+        self.storage_client = storage_client
+        self.bucket_names = bucket_names
+        self.scheduler = scheduler or RequestScheduler()
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def _list_project(self, project_id):
+        try:
+            # A failed page restarts the whole listing on retry.
+            listing = self.scheduler.call(
+                "storage.buckets.list", lambda: {
+                    bucket.name: bucket
+                    for bucket in self.storage_client.list_buckets(
+                        project=project_id, fields=BUCKET_LIST_FIELDS,
+                        page_size=BUCKET_LIST_PAGE_SIZE, retry=None)
+                    if self.bucket_names is None or bucket.name in self.bucket_names
                 })
+            logging.debug(
+                f"Listed {len(listing)} flagged buckets in project {project_id}")
+        except Exception as e:
+            logging.warning(
+                f"Error listing buckets in project {project_id}, falling back to per-bucket lookups: {e}")
+            listing = {}
+        return listing
+
+    def _listing(self, project_id):
+        with self._lock:
+            future = self._listings.get(project_id)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._listings[project_id] = future
+
+        if is_owner:
+            future.set_result(self._list_project(project_id))
+        return future.result()
+
+    def bucket_names_in(self, project_id):
+        listing = self._listing(project_id)
+        with self._lock:
+            return list(listing)
 
+    def lookup(self, project_id, bucket_name):
+        listing = self._listing(project_id)
+        with self._lock:
+            return listing.pop(bucket_name, None)
+
+
+class ObjectAclSampler:
+    """
+    Deep scan of object ACLs for buckets without uniform bucket-level access.
+
+    Objects are listed one page at a time and an object is sampled when the
+    CRC32 of its name falls under `sample_rate`, so repeated runs check the same
+    objects. ACL lookups for a bucket run `max_workers` at a time on a shared
+    pool, at most `cap` objects are checked per bucket, and with
+    `stop_at_first_public` the scan of a bucket ends at its first public object.
+    """
+
+    def __init__(self, storage_client, sample_rate=DEFAULT_OBJECT_SAMPLE_RATE,
+                 cap=DEFAULT_OBJECT_SAMPLE_CAP, stop_at_first_public=False,
+                 max_workers=8, scheduler=None):
+        self.storage_client = storage_client
+        self.sample_rate = sample_rate
+        self.cap = cap
+        self.stop_at_first_public = stop_at_first_public
+        self.max_workers = max(1, max_workers)
+        self.scheduler = scheduler or RequestScheduler()
+        self._threshold = int(sample_rate * 2 ** 32)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _is_sampled(self, object_name):
+        return zlib.crc32(object_name.encode("utf-8")) < self._threshold
+
+    def _list_page(self, bucket_name, page_token):
+        # One request per call, so a retried page never skips or repeats objects.
+        iterator = self.storage_client.list_blobs(
+            bucket_name, page_token=page_token, page_size=OBJECT_LIST_PAGE_SIZE,
+            fields=OBJECT_LIST_FIELDS, retry=None)
+        page = next(iterator.pages, [])
+        return [blob.name for blob in page], iterator.next_page_token
+
+    def _public_entries(self, bucket, object_name):
+        blob = bucket.blob(object_name)
+        self.scheduler.call("storage.objectAccessControls.list",
+                            blob.acl.reload, retry=None)
+        return [(entry["entity"], entry["role"])
+                for entry in blob.acl if entry["entity"] in PUBLIC_MEMBERS]
+
+    def sample(self, bucket_name):
+        bucket = self.storage_client.bucket(bucket_name)
+        result = {"sample_rate": self.sample_rate, "objects_listed": 0, "objects_checked": 0,
+                  "public_objects": 0, "public_entities": [], "examples": [],
+                  "errors": 0, "complete": False}
+        entities = {}
+        pending = deque()
+
+        def collect(object_name, future):
+            try:
+                entries = future.result()
             except Exception as e:
-                logging.error(
-                    f"Error processing bucket {bucket_name} in project {project_id}: {e}")
-                results[project_id]["buckets"].append({
-                    "bucket_name": bucket_name,
-                    "error": str(e),
-                })
+                logging.debug(
+                    f"Error reading ACL of gs://{bucket_name}/{object_name}: {e}")
+                result["errors"] += 1
+                return
+            result["objects_checked"] += 1
+            if entries:
+                result["public_objects"] += 1
+            for entity, role in entries:
+                entities[(entity, role)] = entities.get((entity, role), 0) + 1
+                if len(result["examples"]) < OBJECT_ACL_EXAMPLES:
+                    result["examples"].append(
+                        {"name": object_name, "entity": entity, "role": role})
+
+        def done():
+            return (self.stop_at_first_public and result["public_objects"]) or \
+                result["objects_checked"] + result["errors"] + len(pending) >= self.cap
+
+        try:
+            page_token = None
+            while not done():
+                object_names, page_token = self.scheduler.call(
+                    "storage.objects.list", self._list_page, bucket_name, page_token)
+                result["objects_listed"] += len(object_names)
+                for object_name in object_names:
+                    if done():
+                        break
+                    if not self._is_sampled(object_name):
+                        continue
+                    pending.append((object_name, self._executor.submit(
+                        self._public_entries, bucket, object_name)))
+                    if len(pending) >= self.max_workers:
+                        collect(*pending.popleft())
+                else:
+                    if page_token is None:
+                        result["complete"] = True
+                        break
+        except Exception as e:
+            logging.error(
+                f"Error listing objects of bucket {bucket_name}: {e}")
+            result["error"] = f"Failed to list objects: {str(e)}"
+
+        while pending:
+            object_name, future = pending.popleft()
+            if self.stop_at_first_public and result["public_objects"] and future.cancel():
+                continue
+            collect(object_name, future)
+
+        result["public_entities"] = [
+            {"entity": entity, "role": role, "objects": count}
+            for (entity, role), count in sorted(entities.items())]
+        logging.debug(
+            f"Sampled {result['objects_checked']} of {result['objects_listed']} listed objects in "
+            f"bucket {bucket_name}: {result['public_objects']} public.")
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class BucketDetailsCoalescer:
+    """
+    Fetches each bucket's details once and shares them between all rows of a plan.
+
+    Concurrent requests for the same bucket wait on the first one's result, and
+    an entry is released as soon as the last row referencing it has been served.
+    At most `cache_size` finished entries still waiting for later rows are kept
+    in memory; older ones are spilled to a temporary file and read back by
+    offset, so memory stays flat when a bucket's rows are far apart in the CSV.
+    """
 
-    with open(output_json, "w") as json_file:
-        json.dump(results, json_file, indent=4)
+    def __init__(self, storage_client, plan, lister=None, scheduler=None, state=None,
+                 object_sampler=None, cache_size=DETAILS_CACHE_SIZE):
+        self.storage_client = storage_client
+        self.lister = lister
+        self.scheduler = scheduler or RequestScheduler()
+        self.state = state
+        self.object_sampler = object_sampler
+        self._remaining = dict(plan.references) if plan is not None else {}
+        self._futures = {}
+        self.cache_size = cache_size
+        self._cached = OrderedDict()
+        self._spilled = {}
+        self._spill_file = None
+        self._lock = threading.Lock()
+
+    def _fetch(self, bucket_name, project_id):
+        bucket = None
+        if self.lister is not None and project_id:
+            bucket = self.lister.lookup(project_id, bucket_name)
+        reload = bucket is None
+        if bucket is None:
+            bucket = self.storage_client.bucket(bucket_name)
+
+        if self.state is None:
+            details = extract_bucket_details(
+                bucket, reload=reload, scheduler=self.scheduler)
+        else:
+            previous = self.state.get(bucket_name)
+            details, unchanged = extract_bucket_details_incremental(
+                bucket, previous, reload=reload, scheduler=self.scheduler)
+            self.state.update(bucket_name, project_id, bucket,
+                              details, previous, unchanged)
+
+        # Object ACL changes do not bump the bucket's metageneration, so the
+        # sample is taken on every run and never stored in the state.
+        if self.object_sampler is not None and \
+                details.get("metadata", {}).get("uniformBucketLevelAccess") is False:
+            details = dict(
+                details, object_acls=self.object_sampler.sample(bucket_name))
+        return details
+
+    def _spill(self, bucket_name, future):
+        # Called with the lock held. Errors are kept as their message, which is
+        # all process_row records of them.
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile()
+        error = future.exception()
+        entry = {"error": str(error)} if error is not None else {"details": future.result()}
+        self._spill_file.seek(0, os.SEEK_END)
+        self._spilled[bucket_name] = self._spill_file.tell()
+        self._spill_file.write(json.dumps(entry).encode("utf-8") + b"\n")
+
+    def _read_spilled(self, offset):
+        # Called with the lock held.
+        self._spill_file.seek(offset)
+        entry = json.loads(self._spill_file.readline())
+        if "error" in entry:
+            raise RuntimeError(entry["error"])
+        return entry["details"]
+
+    def get(self, bucket_name, project_id=None):
+        with self._lock:
+            future = self._futures.get(bucket_name)
+            offset = self._spilled.get(bucket_name) if future is None else None
+            is_owner = future is None and offset is None
+            if is_owner:
+                future = Future()
+                self._futures[bucket_name] = future
+
+        if is_owner:
+            try:
+                future.set_result(self._fetch(bucket_name, project_id))
+            except Exception as e:
+                future.set_exception(e)
+
+        try:
+            if offset is not None:
+                with self._lock:
+                    return self._read_spilled(offset)
+            return future.result()
+        finally:
+            with self._lock:
+                remaining = self._remaining.get(bucket_name, 1) - 1
+                if remaining > 0:
+                    self._remaining[bucket_name] = remaining
+                    if future is not None and bucket_name in self._futures \
+                            and bucket_name not in self._cached:
+                        self._cached[bucket_name] = None
+                        while len(self._cached) > self.cache_size:
+                            evicted, _ = self._cached.popitem(last=False)
+                            self._spill(evicted, self._futures.pop(evicted))
+                else:
+                    self._remaining.pop(bucket_name, None)
+                    self._futures.pop(bucket_name, None)
+                    self._cached.pop(bucket_name, None)
+                    self._spilled.pop(bucket_name, None)
+
+    def close(self):
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+
+def iter_discovered_projects(root, resolver, concurrency=1):
+    # Breadth-first walk of the folder tree with at most `concurrency` listings
+    # in flight; only the frontier of unvisited folders is kept in memory.
+    frontier = deque([root])
+    project_count = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        while frontier or pending:
+            while frontier and len(pending) < concurrency:
+                pending.append(executor.submit(
+                    resolver.list_children, frontier.popleft()))
+            folders, project_ids = pending.popleft().result()
+            frontier.extend(folders)
+            project_count += len(project_ids)
+            yield from project_ids
+    logging.info(f"Discovered {project_count} projects under {root}")
+
+
+def iter_discovered_rows(projects, lister, concurrency=1):
+    # Lists the buckets of up to `concurrency` projects at a time and turns each
+    # bucket into a row for the regular investigation pipeline. The listed
+    # metadata is kept by the lister until the row's bucket is investigated.
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        for project_id in projects:
+            pending.append(
+                (project_id, executor.submit(lister.bucket_names_in, project_id)))
+            if len(pending) >= concurrency:
+                project_id, future = pending.popleft()
+                for bucket_name in future.result():
+                    yield {"Cloud Account ID": project_id, "Cloud Asset ID": bucket_name}
+        while pending:
+            project_id, future = pending.popleft()
+            for bucket_name in future.result():
+                yield {"Cloud Account ID": project_id, "Cloud Asset ID": bucket_name}
+
+
+def write_results_json(input_jsonl, output_json):
+    # Index record offsets by project so the per-project JSON report can be
+    # written one bucket at a time instead of loading every record at once.
+    offsets = {}
+    hierarchies = {}
+    with open(input_jsonl, "rb") as jsonl_file:
+        offset = 0
+        for line in jsonl_file:
+            if line.strip():
+                record = json.loads(line)
+                project_id = record["project_id"]
+                if project_id not in offsets:
+                    offsets[project_id] = array("q")
+                    hierarchies[project_id] = (
+                        record.get("folder_id"), record.get("organization_id"))
+                offsets[project_id].append(offset)
+            offset += len(line)
+
+    # Matches the layout of json.dump(results, indent=4).
+    with open(input_jsonl, "rb") as jsonl_file, open(output_json, "w") as json_file:
+        if not offsets:
+            json_file.write("{}")
+        else:
+            json_file.write("{")
+            for project_index, (project_id, project_offsets) in enumerate(offsets.items()):
+                folder_id, organization_id = hierarchies[project_id]
+                json_file.write(("," if project_index else "") +
+                                f"\n    {json.dumps(project_id)}: {{"
+                                f"\n        \"folder_id\": {json.dumps(folder_id)},"
+                                f"\n        \"organization_id\": {json.dumps(organization_id)},"
+                                "\n        \"buckets\": [")
+                for bucket_index, offset in enumerate(project_offsets):
+                    jsonl_file.seek(offset)
+                    record = json.loads(jsonl_file.readline())
+                    bucket_result = {
+                        key: value for key, value in record.items()
+                        if key not in {"project_id", "folder_id", "organization_id"}
+                    }
+                    json_file.write(("," if bucket_index else "") + "\n" +
+                                    textwrap.indent(json.dumps(bucket_result, indent=4), " " * 12))
+                json_file.write("\n        ]\n    }")
+            json_file.write("\n}")
 
     logging.info(f"Investigation results saved to {output_json}")
 
 
+def write_investigation_outputs(records, output_jsonl, output_table_csv,
+                                display_in_terminal=False, append=False, profiler=None):
+    records = write_jsonl_records(
+        records, output_jsonl, append=append, profiler=profiler)
+    if append:
+        # Previous records are read to the end before the first new record is
+        # appended.
+        records = chain(iter_jsonl_records(output_jsonl), records)
+    generate_summary_table(
+        records, output_table_csv, display_in_terminal=display_in_terminal,
+        profiler=profiler)
+
+
+def write_results_report(output_jsonl, output_json, profiler=None):
+    with profile_stage(profiler, "report.json"):
+        write_results_json(output_jsonl, output_json)
+    if profiler is not None:
+        profiler.add_bytes("report.json", os.path.getsize(output_json))
+
+
+def investigate_buckets(credentials, input_csv, output_jsonl, output_json, output_table_csv,
+                        display_in_terminal=False, concurrency=1,
+                        hierarchy_cache=None, hierarchy_cache_ttl=DEFAULT_HIERARCHY_CACHE_TTL,
+                        resume=False, bulk_list=False,
+                        max_rps=DEFAULT_MAX_RPS, max_retries=DEFAULT_MAX_RETRIES,
+                        profiler=None, backend=None, state_db=None, output_deltas_jsonl=None,
+                        deep_scan=False, object_sample_rate=DEFAULT_OBJECT_SAMPLE_RATE,
+                        object_sample_cap=DEFAULT_OBJECT_SAMPLE_CAP, stop_at_first_public=False,
+                        shard=None):
+    logging.debug(
+        f"Starting bucket investigation with concurrency={concurrency}.")
+    backend = backend or GcpClientFactory(
+        credentials, pool_size=pool_size_for(concurrency * 2))
+    storage_client = backend.storage_client()
+    scheduler = RequestScheduler(
+        max_rps=max_rps, max_retries=max_retries, profiler=profiler)
+    resolver = ProjectHierarchyResolver(
+        backend=backend, cache_path=hierarchy_cache,
+        cache_ttl=hierarchy_cache_ttl, max_workers=concurrency, scheduler=scheduler)
+
+    completed = load_checkpoint(output_jsonl) if resume else Counter()
+    with profile_stage(profiler, "csv.plan", os.path.getsize(input_csv)):
+        plan = BucketWorkPlan.from_csv(input_csv, completed, shard)
+    lister = ProjectBucketLister(
+        storage_client, set(plan.references), scheduler) if bulk_list else None
+    state = BucketStateStore(
+        state_db, output_deltas_jsonl, append=resume) if state_db else None
+    object_sampler = ObjectAclSampler(
+        storage_client, object_sample_rate, object_sample_cap, stop_at_first_public,
+        max_workers=concurrency, scheduler=scheduler) if deep_scan else None
+    fetcher = BucketDetailsCoalescer(
+        storage_client, plan, lister, scheduler, state, object_sampler)
+
+    try:
+        with open(input_csv, mode="r") as file:
+            rows = plan.iter_rows(csv.DictReader(file))
+            rows = prefetch_hierarchies(rows, resolver)
+            records = iter_investigation_records(
+                fetcher, resolver, rows, concurrency, profiler)
+            write_investigation_outputs(
+                records, output_jsonl, output_table_csv,
+                display_in_terminal=display_in_terminal, append=resume, profiler=profiler)
+    finally:
+        resolver.save()
+        if state is not None:
+            state.close()
+        if object_sampler is not None:
+            object_sampler.close()
+        fetcher.close()
+
+    write_results_report(output_jsonl, output_json, profiler)
+
+
+def discover_buckets(credentials, root, output_jsonl, output_json, output_table_csv,
+                     display_in_terminal=False, concurrency=1,
+                     hierarchy_cache=None, hierarchy_cache_ttl=DEFAULT_HIERARCHY_CACHE_TTL,
+                     max_rps=DEFAULT_MAX_RPS, max_retries=DEFAULT_MAX_RETRIES,
+                     profiler=None, backend=None, state_db=None, output_deltas_jsonl=None,
+                     deep_scan=False, object_sample_rate=DEFAULT_OBJECT_SAMPLE_RATE,
+                     object_sample_cap=DEFAULT_OBJECT_SAMPLE_CAP, stop_at_first_public=False):
+    # Same outputs as investigate_buckets, but the buckets come from walking the
+    # organization/folder hierarchy under `root` instead of a scanner CSV.
+    logging.debug(
+        f"Starting bucket discovery under {root} with concurrency={concurrency}.")
+    backend = backend or GcpClientFactory(
+        credentials, pool_size=pool_size_for(concurrency * 2))
+    storage_client = backend.storage_client()
+    scheduler = RequestScheduler(
+        max_rps=max_rps, max_retries=max_retries, profiler=profiler)
+    resolver = ProjectHierarchyResolver(
+        backend=backend, cache_path=hierarchy_cache,
+        cache_ttl=hierarchy_cache_ttl, max_workers=concurrency, scheduler=scheduler)
+    lister = ProjectBucketLister(storage_client, None, scheduler)
+    state = BucketStateStore(
+        state_db, output_deltas_jsonl) if state_db else None
+    object_sampler = ObjectAclSampler(
+        storage_client, object_sample_rate, object_sample_cap, stop_at_first_public,
+        max_workers=concurrency, scheduler=scheduler) if deep_scan else None
+    fetcher = BucketDetailsCoalescer(
+        storage_client, None, lister, scheduler, state, object_sampler)
+
+    try:
+        projects = iter_discovered_projects(root, resolver, concurrency)
+        rows = iter_discovered_rows(projects, lister, concurrency)
+        records = iter_investigation_records(
+            fetcher, resolver, rows, concurrency, profiler)
+        write_investigation_outputs(
+            records, output_jsonl, output_table_csv,
+            display_in_terminal=display_in_terminal, profiler=profiler)
+    finally:
+        resolver.save()
+        if state is not None:
+            state.close()
+        if object_sampler is not None:
+            object_sampler.close()
+        fetcher.close()
+
+    write_results_report(output_jsonl, output_json, profiler)
+
+
+def iter_merged_shard_records(input_csv, shard_jsonls):
+    # Index every shard's records by (project, bucket), then walk the input CSV
+    # and emit them in its row order, so the merged output is the same however
+    # the shards were scheduled and whether or not they were resumed.
+    offsets = {}
+    for shard_index, shard_jsonl in enumerate(shard_jsonls):
+        with open(shard_jsonl, "rb") as jsonl_file:
+            offset = 0
+            for line in jsonl_file:
+                if line.strip():
+                    record = json.loads(line)
+                    key = (record["project_id"], record.get("bucket_name"))
+                    offsets.setdefault(key, deque()).append((shard_index, offset))
+                offset += len(line)
+
+    jsonl_files = [open(shard_jsonl, "rb") for shard_jsonl in shard_jsonls]
+    try:
+        def read_record(shard_index, offset):
+            jsonl_file = jsonl_files[shard_index]
+            jsonl_file.seek(offset)
+            return json.loads(jsonl_file.readline())
+
+        with open(input_csv, mode="r") as file:
+            for row in csv.DictReader(file):
+                key = row_work_key(row)
+                if key is not None and offsets.get(key):
+                    yield read_record(*offsets[key].popleft())
+
+        # Records the CSV does not account for (e.g. an edited input) are kept,
+        # after the others, in shard order.
+        leftover = [entry for entries in offsets.values() for entry in entries]
+        if leftover:
+            logging.warning(
+                f"{len(leftover)} shard records do not match a row of {input_csv}; appending them in shard order.")
+            for entry in sorted(leftover):
+                yield read_record(*entry)
+    finally:
+        for jsonl_file in jsonl_files:
+            jsonl_file.close()
+
+
+def merge_shard_outputs(input_csv, shards, output_jsonl, output_json, output_table_csv,
+                        output_deltas_jsonl=None, display_in_terminal=False, profiler=None):
+    shard_jsonls = [shard_path(output_jsonl, shard_index, shards)
+                    for shard_index in range(shards)]
+    missing = [path for path in shard_jsonls if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(
+            f"Missing shard outputs: {', '.join(missing)}")
+
+    logging.info(f"Merging {shards} shard outputs into {output_jsonl}.")
+    with profile_stage(profiler, "merge.shards"):
+        records = iter_merged_shard_records(input_csv, shard_jsonls)
+        write_investigation_outputs(
+            records, output_jsonl, output_table_csv,
+            display_in_terminal=display_in_terminal, profiler=profiler)
+    write_results_report(output_jsonl, output_json, profiler)
+
+    shard_deltas = [shard_path(output_deltas_jsonl, shard_index, shards)
+                    for shard_index in range(shards)] if output_deltas_jsonl else []
+    shard_deltas = [path for path in shard_deltas if os.path.exists(path)]
+    if shard_deltas:
+        with open(output_deltas_jsonl, "wb") as deltas_file:
+            for path in shard_deltas:
+                with open(path, "rb") as shard_file:
+                    shutil.copyfileobj(shard_file, deltas_file)
+        logging.info(f"Shard deltas merged into {output_deltas_jsonl}")
+
+
+def run_shard_processes(argv, shards, max_rps):
+    # Every shard re-runs this script with the same arguments plus its index.
+    # The rate limit is split between the shards so that together they stay
+    # within --max-rps.
+    script = os.path.abspath(__file__)
+    processes = []
+    for shard_index in range(shards):
+        command = [sys.executable, script, *argv, "--shard-index", str(shard_index),
+                   "--max-rps", str(max_rps / shards)]
+        logging.info(f"Starting shard {shard_index} of {shards}.")
+        processes.append(subprocess.Popen(command))
+
+    failed = [shard_index for shard_index, process in enumerate(processes)
+              if process.wait() != 0]
+    if failed:
+        raise RuntimeError(
+            f"Failed shards: {', '.join(map(str, failed))}; rerun with --resume to finish them.")
+    logging.info(f"All {shards} shards finished.")
+
+
+def run_merge(argv):
+    parser = argparse.ArgumentParser(
+        prog="investigate_gcpstoragebucket_publicread.py merge",
+        description="Merge the outputs of a run split with --shards/--shard-index into the standard outputs.")
+    parser.add_argument("--csv", type=str, required=True,
+                        help="Input CSV the shards were run on; its row order is the order of the merged outputs.")
+    parser.add_argument("--shards", type=int, required=True,
+                        help="Number of shards the run was split into.")
+    parser.add_argument("--index-db", type=str,
+                        help="Also add the merged results to this SQLite exposure index (optional).")
+    parser.add_argument("--pivot", action="store_true",
+                        help="Also write summary_pivot.csv from the merged summary table (requires pandas).")
+    args = parser.parse_args(argv)
+
+    if args.shards < 2:
+        parser.error("--shards must be at least 2.")
+    if args.pivot and importlib.util.find_spec("pandas") is None:
+        parser.error(
+            "--pivot requires pandas; install it with requirements-pivot.txt.")
+    for shard_index in range(args.shards):
+        shard_jsonl = shard_path(
+            "public_bucket_read_investigation.jsonl", shard_index, args.shards)
+        if not os.path.exists(shard_jsonl):
+            parser.error(f"Shard output {shard_jsonl} does not exist.")
+    validate_csv(args.csv)
+    merge_shard_outputs(args.csv, args.shards, "public_bucket_read_investigation.jsonl",
+                        "public_bucket_read_investigation.json", "summary_table.csv",
+                        output_deltas_jsonl="public_bucket_read_deltas.jsonl", display_in_terminal=True)
+    if args.index_db:
+        write_exposure_index("public_bucket_read_investigation.jsonl",
+                             args.index_db, source=args.csv)
+    if args.pivot:
+        generate_summary_pivot("summary_table.csv", "summary_pivot.csv")
+
+
+class RemediationJournal:
+    """
+    Append-only JSONL journal of remediation changes, used for rollback.
+
+    Every change is preceded by a `pending` entry: one with the bindings about
+    to be removed before the IAM policy is written, and one with the previous
+    public access prevention setting before it is enforced. A crash mid-run
+    therefore never loses the information needed to undo it. Each bucket then
+    gets an entry with the outcome.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(dict(entry, recorded_at=time.time())) + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def binding_key(binding):
+    condition = binding.get("condition")
+    return binding["role"], json.dumps(condition, sort_keys=True) if condition else None
+
+
+class PolicyRejectedError(Exception):
+    """Raised when GCS refuses an IAM policy itself (412 on an unchanged etag), so retrying cannot help."""
+
+
+def set_iam_policy_guarded(bucket, policy, scheduler):
+    # setIamPolicy answers 412 both when the etag no longer matches and when
+    # the policy is refused, e.g. public members while public access
+    # prevention is enforced. Only the first is a race worth re-reading for.
+    from google.api_core.exceptions import PreconditionFailed
+
+    try:
+        scheduler.call("storage.buckets.setIamPolicy",
+                       bucket.set_iam_policy, policy, retry=None)
+    except PreconditionFailed as e:
+        current = scheduler.call(
+            "storage.buckets.getIamPolicy", bucket.get_iam_policy,
+            requested_policy_version=3, retry=None)
+        if current.etag == policy.etag:
+            raise PolicyRejectedError(
+                f"IAM policy of bucket {bucket.name} was rejected: {e}") from e
+        raise
+
+
+def read_public_access_prevention(bucket, scheduler):
+    scheduler.call("storage.buckets.get", bucket.reload, retry=None)
+    return bucket._properties.get("iamConfiguration", {}).get(
+        "publicAccessPrevention", "inherited")
+
+
+def call_with_conflict_retries(bucket_name, func):
+    from google.api_core.exceptions import PreconditionFailed
+
+    for attempt in range(REMEDIATION_CONFLICT_RETRIES):
+        try:
+            return func()
+        except PreconditionFailed:
+            if attempt == REMEDIATION_CONFLICT_RETRIES - 1:
+                raise
+            logging.debug(
+                f"Bucket {bucket_name} changed concurrently, retrying ({attempt + 1}).")
+
+
+def set_public_access_prevention(bucket, value, scheduler):
+    # Metageneration-guarded patch, so a concurrent metadata change is re-read
+    # instead of overwritten.
+    def patch():
+        current = read_public_access_prevention(bucket, scheduler)
+        if current == value:
+            return current
+        bucket.iam_configuration.public_access_prevention = value
+        scheduler.call("storage.buckets.patch", bucket.patch,
+                       if_metageneration_match=bucket.metageneration, retry=None)
+        return current
+
+    return call_with_conflict_retries(bucket.name, patch)
+
+
+def remediate_bucket(storage_client, bucket_name, scheduler, journal=None,
+                     enforce_pap=False, dry_run=False):
+    bucket = storage_client.bucket(bucket_name)
+    result = {"bucket_name": bucket_name, "removed": [],
+              "public_access_prevention": None, "dry_run": dry_run}
+
+    def remove_public_members():
+        # The policy's etag travels back with set_iam_policy, so a policy that
+        # changed since it was read fails with 412 and is read again.
+        policy = scheduler.call(
+            "storage.buckets.getIamPolicy", bucket.get_iam_policy,
+            requested_policy_version=3, retry=None)
+        removed = public_bindings(policy.bindings)
+        result["removed"] = removed
+        if not removed or dry_run:
+            return
+        if journal is not None:
+            journal.write(dict(result, status="pending", etag=policy.etag))
+        policy.bindings = [
+            dict(binding, members=set(binding["members"]) - PUBLIC_MEMBERS)
+            for binding in policy.bindings
+            if set(binding["members"]) - PUBLIC_MEMBERS
+        ]
+        set_iam_policy_guarded(bucket, policy, scheduler)
+
+    try:
+        call_with_conflict_retries(bucket_name, remove_public_members)
+        if enforce_pap:
+            before = read_public_access_prevention(bucket, scheduler)
+            if before != "enforced":
+                result["public_access_prevention"] = {
+                    "before": before, "after": "enforced"}
+                if not dry_run:
+                    # Journaled before the patch, so a crash right after it
+                    # can still be rolled back.
+                    if journal is not None:
+                        journal.write(dict(result, status="pending"))
+                    set_public_access_prevention(bucket, "enforced", scheduler)
+        if not result["removed"] and not result["public_access_prevention"]:
+            result["status"] = "compliant"
+        else:
+            result["status"] = "planned" if dry_run else "remediated"
+    except Exception as e:
+        logging.error(f"Error remediating bucket {bucket_name}: {e}")
+        result["status"] = "failed"
+        result["error"] = str(e)
+
+    if journal is not None and result["status"] != "compliant":
+        journal.write(result)
+    return result
+
+
+def rollback_bucket(storage_client, entry, scheduler, journal=None, dry_run=False):
+    # Restores the previous public access prevention first, since GCS refuses
+    # public members while it is enforced, then re-adds the journaled members.
+    # Members that are already present are left alone, so a rollback can be
+    # repeated safely.
+    bucket = storage_client.bucket(entry["bucket_name"])
+    result = {"bucket_name": entry["bucket_name"], "restored": [],
+              "public_access_prevention": None, "dry_run": dry_run}
+
+    def restore_members():
+        policy = scheduler.call(
+            "storage.buckets.getIamPolicy", bucket.get_iam_policy,
+            requested_policy_version=3, retry=None)
+        bindings = {binding_key(binding): binding for binding in policy.bindings}
+        restored = []
+        for removed in entry["removed"]:
+            binding = bindings.get(binding_key(removed))
+            if binding is None:
+                binding = dict(removed, members=set())
+                bindings[binding_key(removed)] = binding
+                policy.bindings.append(binding)
+            missing = set(removed["members"]) - set(binding["members"])
+            if missing:
+                binding["members"] = set(binding["members"]) | missing
+                restored.append(dict(removed, members=sorted(missing)))
+        result["restored"] = restored
+        if restored and not dry_run:
+            set_iam_policy_guarded(bucket, policy, scheduler)
+
+    try:
+        previous = (entry.get("public_access_prevention") or {}).get("before")
+        if previous and previous != "enforced":
+            if dry_run:
+                before = read_public_access_prevention(bucket, scheduler)
+            else:
+                before = set_public_access_prevention(bucket, previous, scheduler)
+            if before != previous:
+                result["public_access_prevention"] = {
+                    "before": before, "after": previous}
+        if entry["removed"]:
+            call_with_conflict_retries(entry["bucket_name"], restore_members)
+        changed = result["restored"] or result["public_access_prevention"]
+        if not changed:
+            result["status"] = "compliant"
+        else:
+            result["status"] = "planned" if dry_run else "rolled_back"
+    except Exception as e:
+        logging.error(f"Error rolling back bucket {entry['bucket_name']}: {e}")
+        result["status"] = "failed"
+        result["error"] = str(e)
+
+    if journal is not None and result["status"] != "compliant":
+        journal.write(result)
+    return result
+
+
+def iter_public_bucket_names(records, min_severity=0):
+    classifier = ExposureClassifier()
+    seen = set()
+    for record in records:
+        details = record.get("details", {})
+        bucket_name = record.get("bucket_name")
+        if bucket_name in seen or not details.get("iam_policy", {}).get("bindings"):
+            continue
+        if min_severity and classifier.classify(details)["severity"] < min_severity:
+            continue
+        seen.add(bucket_name)
+        yield bucket_name
+
+
+def iter_rollback_entries(journal_path):
+    # The earliest applied entry per bucket holds its original bindings. The
+    # previous public access prevention is journaled in a later pending entry,
+    # written just before it was enforced.
+    entries = {}
+    for entry in iter_jsonl_records(journal_path):
+        if entry.get("dry_run") or "removed" not in entry or "restored" in entry:
+            continue
+        if entry["bucket_name"] not in entries:
+            entries[entry["bucket_name"]] = entry
+        elif entry.get("public_access_prevention") and \
+                not entries[entry["bucket_name"]].get("public_access_prevention"):
+            entries[entry["bucket_name"]]["public_access_prevention"] = entry["public_access_prevention"]
+    return list(entries.values())
+
+
+def run_remediation(func, items, concurrency=1):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= concurrency * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def remediate_buckets(storage_client, bucket_names, journal_path, concurrency=1,
+                      enforce_pap=False, dry_run=False, scheduler=None, rollback_entries=None):
+    scheduler = scheduler or RequestScheduler()
+    journal = RemediationJournal(journal_path)
+    try:
+        if rollback_entries is not None:
+            results = run_remediation(
+                lambda entry: rollback_bucket(storage_client, entry, scheduler, journal, dry_run),
+                rollback_entries, concurrency)
+        else:
+            results = run_remediation(
+                lambda bucket_name: remediate_bucket(
+                    storage_client, bucket_name, scheduler, journal, enforce_pap, dry_run),
+                bucket_names, concurrency)
+
+        counts = {}
+        changes = []
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if result["status"] != "compliant" and len(changes) < TERMINAL_SUMMARY_MAX_ROWS:
+                changes.append(result)
+    finally:
+        journal.close()
+
+    if changes:
+        print(tabulate([{
+            "Bucket Name": result["bucket_name"],
+            "Status": result["status"],
+            "Bindings": "; ".join(
+                f"{binding['role']}: {', '.join(binding['members'])}"
+                for binding in result.get("removed", result.get("restored", []))) or "None",
+            "Public Access Prevention": "{before} -> {after}".format(
+                **result["public_access_prevention"]) if result["public_access_prevention"] else "Unchanged",
+        } for result in changes], headers="keys", tablefmt="grid"))
+    logging.info(
+        f"Remediation {'plan' if dry_run else 'run'} finished: "
+        + ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+        + f". Journal saved to {journal_path}")
+    return counts
+
+
+def run_remediate(argv):
+    parser = argparse.ArgumentParser(
+        prog="investigate_gcpstoragebucket_publicread.py remediate",
+        description="Remove allUsers/allAuthenticatedUsers bindings from the public buckets of an investigation run.")
+    parser.add_argument("--jsonl", type=str, default="public_bucket_read_investigation.jsonl",
+                        help="Investigation records listing the buckets to fix (default: public_bucket_read_investigation.jsonl).")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only print and journal the changes that would be made.")
+    parser.add_argument("--enforce-pap", action="store_true",
+                        help="Also set publicAccessPrevention to enforced on every remediated bucket.")
+    parser.add_argument("--min-severity", type=int, default=0,
+                        help="Only remediate buckets at or above this severity (default: 0, every public bucket).")
+    parser.add_argument("--journal", type=str, default=DEFAULT_REMEDIATION_JOURNAL,
+                        help=f"Rollback journal appended to by every run (default: {DEFAULT_REMEDIATION_JOURNAL}).")
+    parser.add_argument("--rollback", type=str,
+                        help="Undo the changes recorded in this journal instead of remediating.")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Number of buckets remediated in parallel (default: 16).")
+    parser.add_argument("--max-rps", type=float, default=DEFAULT_MAX_RPS,
+                        help="Maximum requests per second to each GCP API (default: 50).")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="Retries with exponential backoff for throttled or failed GCP API calls (default: 5).")
+    parser.add_argument("--auth-method", choices=["oauth", "secret"],
+                        help="oauth uses Application Default Credentials, secret a Service Account key from Secret Manager.")
+    parser.add_argument("--secret-name", type=str,
+                        help="Name of the GCP Secret for Service Account authentication (optional).")
+    parser.add_argument("--secret-project-id", type=str,
+                        help="GCP Project ID where the secret is stored (optional).")
+    args = parser.parse_args(argv)
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1.")
+    source = args.rollback or args.jsonl
+    if not os.path.exists(source):
+        parser.error(f"{source} does not exist.")
+    if args.rollback and os.path.abspath(args.rollback) == os.path.abspath(args.journal):
+        parser.error("--journal must differ from the journal being rolled back.")
+
+    provider = authenticate_gcp(
+        args.auth_method, args.secret_name, args.secret_project_id)
+    clients = GcpClientFactory(
+        provider.credentials, pool_size=pool_size_for(args.concurrency))
+    try:
+        scheduler = RequestScheduler(
+            max_rps=args.max_rps, max_retries=args.max_retries)
+        if args.rollback:
+            counts = remediate_buckets(
+                clients.storage_client(), None, args.journal, args.concurrency,
+                dry_run=args.dry_run, scheduler=scheduler,
+                rollback_entries=iter_rollback_entries(args.rollback))
+        else:
+            counts = remediate_buckets(
+                clients.storage_client(),
+                iter_public_bucket_names(iter_jsonl_records(args.jsonl), args.min_severity),
+                args.journal, args.concurrency, enforce_pap=args.enforce_pap,
+                dry_run=args.dry_run, scheduler=scheduler)
+    finally:
+        clients.close()
+        provider.stop()
+    if counts.get("failed"):
+        sys.exit(1)
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        run_query(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "reclassify":
+        run_reclassify(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "remediate":
+        run_remediate(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "merge":
+        run_merge(sys.argv[2:])
+        sys.exit(0)
+
     try:
         parser = argparse.ArgumentParser(
             description="GCP Storage Bucket Investigation Tool")
-        parser.add_argument("--csv", type=str, required=True,
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument("--csv", type=str,
                             help="Path to the input CSV file containing Cloud Account ID and Cloud Asset ID columns.")
+        source.add_argument("--discover", type=str,
+                            help="Discover and investigate every bucket under an organization or folder (e.g. organizations/123 or folders/456) instead of reading a CSV.")
+        parser.add_argument("--auth-method", choices=["oauth", "secret"],
+                            help="oauth uses Application Default Credentials, secret a Service Account key from Secret Manager (default: secret when --secret-name is given, otherwise oauth).")
         parser.add_argument("--secret-name", type=str,
                             help="Name of the GCP Secret for Service Account authentication (optional).")
         parser.add_argument("--secret-project-id", type=str,
                             help="GCP Project ID where the secret is stored (optional).")
+        parser.add_argument("--concurrency", type=int, default=1,
+                            help="Number of buckets to investigate in parallel (default: 1, serial).")
+        parser.add_argument("--hierarchy-cache", type=str,
+                            help="Path to an on-disk project hierarchy cache reused across runs (optional).")
+        parser.add_argument("--hierarchy-cache-ttl", type=int, default=DEFAULT_HIERARCHY_CACHE_TTL,
+                            help="Seconds a cached project hierarchy stays valid (default: 86400).")
+        parser.add_argument("--resume", action="store_true",
+                            help="Resume an interrupted run, skipping buckets already recorded in public_bucket_read_investigation.jsonl.")
+        parser.add_argument("--bulk-list", action="store_true",
+                            help="Fetch bucket metadata with one list_buckets call per project instead of one reload per bucket.")
+        parser.add_argument("--max-rps", type=float, default=DEFAULT_MAX_RPS,
+                            help="Maximum requests per second to each GCP API; lowered automatically on quota errors (default: 50).")
+        parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                            help="Retries with exponential backoff for throttled or failed GCP API calls (default: 5).")
+        parser.add_argument("--state-db", type=str,
+                            help="SQLite state store for incremental runs; unchanged buckets are skipped and changes saved to public_bucket_read_deltas.jsonl (optional).")
+        parser.add_argument("--deep-scan", action="store_true",
+                            help="Sample object ACLs of buckets without uniform bucket-level access for public objects.")
+        parser.add_argument("--object-sample-rate", type=float, default=DEFAULT_OBJECT_SAMPLE_RATE,
+                            help="Fraction of listed objects whose ACL is checked with --deep-scan (default: 0.01).")
+        parser.add_argument("--object-sample-cap", type=int, default=DEFAULT_OBJECT_SAMPLE_CAP,
+                            help="Maximum object ACLs checked per bucket with --deep-scan (default: 1000).")
+        parser.add_argument("--stop-at-first-public", action="store_true",
+                            help="End a bucket's deep scan at its first public object.")
+        parser.add_argument("--shards", type=int, default=1,
+                            help="Split the CSV by project into this many shards, run them as separate processes and merge their outputs (default: 1).")
+        parser.add_argument("--shard-index", type=int,
+                            help="Run only this shard (0 to --shards - 1), e.g. on another machine; merge the shard outputs with the `merge` subcommand.")
+        parser.add_argument("--index-db", type=str,
+                            help="Also add the results to this SQLite exposure index, queried with the `query` subcommand (optional).")
+        parser.add_argument("--pivot", action="store_true",
+                            help="Also write summary_pivot.csv with bucket counts per folder/project and Exposure Match (requires pandas).")
+        parser.add_argument("--profile", action="store_true",
+                            help="Record per-stage latency, error and byte counts and save them to investigation_profile.json.")
         parser.add_argument("--debug", action="store_true",
                             help="Enable debug-level logging.")
 
         args = parser.parse_args()
+        if args.concurrency < 1:
+            parser.error("--concurrency must be at least 1.")
+        if args.max_rps <= 0:
+            parser.error("--max-rps must be greater than 0.")
+        if args.discover and not args.discover.startswith(("organizations/", "folders/")):
+            parser.error(
+                "--discover must be organizations/<id> or folders/<id>.")
+        if not 0 < args.object_sample_rate <= 1:
+            parser.error("--object-sample-rate must be in (0, 1].")
+        if args.object_sample_cap < 1:
+            parser.error("--object-sample-cap must be at least 1.")
+        uses_secret = args.auth_method == "secret" or (
+            args.auth_method is None and args.secret_name)
+        if uses_secret and not (args.secret_name and args.secret_project_id):
+            parser.error(
+                "Service Account authentication needs --secret-name and --secret-project-id.")
+        if args.discover and args.resume:
+            parser.error("--resume is only supported with --csv.")
+        if args.pivot and importlib.util.find_spec("pandas") is None:
+            parser.error(
+                "--pivot requires pandas; install it with requirements-pivot.txt.")
+        if args.shards < 1:
+            parser.error("--shards must be at least 1.")
+        if args.discover and args.shards > 1:
+            parser.error("--shards is only supported with --csv.")
+        if args.shard_index is not None and not 0 <= args.shard_index < args.shards:
+            parser.error("--shard-index must be between 0 and --shards - 1.")
+        sharded = args.shard_index is not None
+        run_shards = args.shards > 1 and not sharded
 
         # Set log level based on --debug flag
         if args.debug:
@@ -298,28 +2539,103 @@ if __name__ == "__main__":
         else:
             logging.getLogger().setLevel(logging.INFO)
 
-        validate_csv(args.csv)
+        if args.csv:
+            validate_csv(args.csv)
+
+        if sharded:
+            for handler in logging.getLogger().handlers:
+                handler.setFormatter(logging.Formatter(
+                    f"%(asctime)s - shard {args.shard_index} - %(levelname)s - %(message)s"))
 
         logging.info("\nWelcome to the GCP Storage Bucket Investigation Tool")
 
-        credentials, temp_key_path = authenticate_gcp(
-            secret_name=args.secret_name, secret_project_id=args.secret_project_id)
+        provider = authenticate_gcp(
+            args.auth_method, args.secret_name, args.secret_project_id)
+        credentials = provider.credentials
+        # Record workers and hierarchy prefetch workers share the HTTP pool.
+        backend = GcpClientFactory(
+            credentials, pool_size=pool_size_for(args.concurrency * 2))
 
         try:
             input_csv = args.csv
+            output_jsonl = "public_bucket_read_investigation.jsonl"
             output_json = "public_bucket_read_investigation.json"
             output_table_csv = "summary_table.csv"
+            output_deltas_jsonl = "public_bucket_read_deltas.jsonl"
+            output_pivot_csv = "summary_pivot.csv"
+            output_profile_json = "investigation_profile.json"
+            hierarchy_cache = args.hierarchy_cache
+            state_db = args.state_db
+            shard = (args.shard_index, args.shards) if sharded else None
+            if sharded:
+                # Everything a shard writes is suffixed with its index, so that
+                # shards can share a working directory.
+                output_jsonl, output_json, output_table_csv, output_deltas_jsonl, output_profile_json, \
+                    hierarchy_cache, state_db = [
+                        path and shard_path(path, *shard) for path in (
+                            output_jsonl, output_json, output_table_csv, output_deltas_jsonl,
+                            output_profile_json, hierarchy_cache, state_db)]
+            profiler = RunProfiler() if args.profile else None
+
+            if run_shards:
+                run_shard_processes(sys.argv[1:], args.shards, args.max_rps)
+                merge_shard_outputs(input_csv, args.shards, output_jsonl, output_json, output_table_csv,
+                                    output_deltas_jsonl=output_deltas_jsonl if args.state_db else None,
+                                    display_in_terminal=True, profiler=profiler)
+            elif args.discover:
+                discover_buckets(credentials, args.discover, output_jsonl, output_json, output_table_csv,
+                                 display_in_terminal=True,
+                                 concurrency=args.concurrency,
+                                 hierarchy_cache=hierarchy_cache,
+                                 hierarchy_cache_ttl=args.hierarchy_cache_ttl,
+                                 max_rps=args.max_rps,
+                                 max_retries=args.max_retries,
+                                 profiler=profiler,
+                                 backend=backend,
+                                 state_db=state_db,
+                                 output_deltas_jsonl=output_deltas_jsonl,
+                                 deep_scan=args.deep_scan,
+                                 object_sample_rate=args.object_sample_rate,
+                                 object_sample_cap=args.object_sample_cap,
+                                 stop_at_first_public=args.stop_at_first_public)
+            else:
+                investigate_buckets(credentials, input_csv, output_jsonl, output_json, output_table_csv,
+                                display_in_terminal=not sharded,
+                                concurrency=args.concurrency,
+                                hierarchy_cache=hierarchy_cache,
+                                hierarchy_cache_ttl=args.hierarchy_cache_ttl,
+                                resume=args.resume,
+                                bulk_list=args.bulk_list,
+                                max_rps=args.max_rps,
+                                max_retries=args.max_retries,
+                                profiler=profiler,
+                                backend=backend,
+                                state_db=state_db,
+                                output_deltas_jsonl=output_deltas_jsonl,
+                                deep_scan=args.deep_scan,
+                                object_sample_rate=args.object_sample_rate,
+                                object_sample_cap=args.object_sample_cap,
+                                stop_at_first_public=args.stop_at_first_public,
+                                shard=shard)
+
+            if sharded and (args.index_db or args.pivot):
+                logging.info(
+                    "--index-db and --pivot are applied to the merged outputs; skipping them for this shard.")
+            elif args.index_db:
+                with profile_stage(profiler, "index.sqlite"):
+                    write_exposure_index(
+                        output_jsonl, args.index_db, source=args.csv or args.discover)
 
-            investigate_buckets(credentials, input_csv, output_json)
+            if args.pivot and not sharded:
+                with profile_stage(profiler, "summary.pivot"):
+                    generate_summary_pivot(output_table_csv, output_pivot_csv)
 
-            with open(output_json, "r") as json_file:
-                results = json.load(json_file)
-                generate_summary_table(
-                    results, output_table_csv, display_in_terminal=True)
+            if profiler is not None:
+                profiler.write_report(
+                    output_profile_json, display_in_terminal=True)
         finally:
-            if temp_key_path and os.path.exists(temp_key_path):
-                os.remove(temp_key_path)
-                logging.info(f"Temporary file {temp_key_path} deleted.")
+            backend.close()
+            provider.stop()
     except Exception as e:
         logging.error(f"Unhandled exception: {e}")
         raise
@@ -0,0 +1,56 @@
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, ".."))
+
+import investigate_gcpstoragebucket_publicread as investigation  # noqa: E402
+
+
+def bucket_record(i):
+    details = {"iam_policy": {"bindings": []}}
+    if i % 3 == 0:
+        details["iam_policy"]["bindings"].append(
+            {"role": "roles/storage.objectViewer", "members": ["allUsers"]})
+    if i % 50 == 1:
+        details["metadata"] = {"error": "403 Forbidden"}
+    return {"organization_id": "1", "folder_id": "2", "project_id": f"project-{i % 4}",
+            "bucket_name": f"bucket-{i}", "details": details}
+
+
+class ExposureIndexTest(unittest.TestCase):
+    """Indexing of investigation records into the SQLite exposure index."""
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.index = investigation.ExposureIndex(os.path.join(self.work_dir.name, "index.db"))
+
+    def tearDown(self):
+        self.index._connection.close()
+        self.work_dir.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def test_bucket_listed_on_several_rows_is_indexed_once(self):
+        # Three CSV rows per bucket produce three records per bucket.
+        records = [bucket_record(i) for _ in range(3) for i in range(201)]
+        self.index.add_run(records, source="test")
+
+        _, runs = self.index.runs()
+        self.assertEqual(runs[0][3:], (201, 67))
+        _, bindings = self.index.query()
+        self.assertEqual(len(bindings), 67)
+
+    def test_nested_errors_are_indexed(self):
+        self.index.add_run([bucket_record(i) for i in range(201)], source="test")
+
+        errors = self.index._connection.execute(
+            "SELECT bucket_name, error FROM buckets WHERE error IS NOT NULL ORDER BY bucket_name").fetchall()
+        self.assertEqual(errors, [(f"bucket-{i}", "403 Forbidden") for i in (1, 101, 151, 51)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, ".."))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "..", "Benchmark"))
+
+import investigate_gcpstoragebucket_publicread as investigation  # noqa: E402
+from fake_gcp_backend import FakeGcpBackend  # noqa: E402
+
+PUBLIC_BUCKETS = ["bench-bucket-0", "bench-bucket-1", "bench-bucket-4"]
+
+
+class RemediationRollbackTest(unittest.TestCase):
+    """Remediation and rollback against the in-process fake in ../Benchmark."""
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.backend = FakeGcpBackend(bucket_count=8, project_count=2)
+        self.client = self.backend.storage_client()
+        self.scheduler = investigation.RequestScheduler(max_rps=10000, max_retries=0)
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.work_dir.name, "remediation.jsonl")
+        self.rollback_journal = os.path.join(self.work_dir.name, "rollback.jsonl")
+        self.original = {name: self.bindings(name) for name in PUBLIC_BUCKETS}
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def bindings(self, name):
+        return sorted((binding["role"], sorted(binding["members"]))
+                      for binding in self.backend.bucket_bindings(name))
+
+    def public_access_prevention(self, name):
+        return self.backend.bucket_properties(name)["iamConfiguration"]["publicAccessPrevention"]
+
+    def remediate(self, **kwargs):
+        return investigation.remediate_buckets(
+            self.client, PUBLIC_BUCKETS, self.journal, concurrency=4, scheduler=self.scheduler, **kwargs)
+
+    def rollback(self, dry_run=False):
+        return investigation.remediate_buckets(
+            self.client, None, self.rollback_journal, concurrency=4, dry_run=dry_run,
+            scheduler=self.scheduler, rollback_entries=investigation.iter_rollback_entries(self.journal))
+
+    def test_rollback_restores_enforced_public_access_prevention_before_members(self):
+        self.assertEqual(self.remediate(enforce_pap=True), {"remediated": 3})
+        for name in PUBLIC_BUCKETS:
+            self.assertEqual(self.public_access_prevention(name), "enforced")
+            self.assertNotIn("allUsers", json.dumps(self.bindings(name)))
+
+        self.assertEqual(self.rollback(), {"rolled_back": 3})
+        for name in PUBLIC_BUCKETS:
+            self.assertEqual(self.public_access_prevention(name), "inherited")
+            self.assertEqual(self.bindings(name), self.original[name])
+        self.assertEqual(self.rollback(), {"compliant": 3})
+
+    def test_rollback_after_crash_following_the_public_access_prevention_patch(self):
+        self.remediate(enforce_pap=True)
+        # Keep only the pending entries, as if the run died right after each patch.
+        with open(self.journal) as journal_file:
+            pending = [line for line in journal_file if json.loads(line)["status"] == "pending"]
+        with open(self.journal, "w") as journal_file:
+            journal_file.writelines(pending)
+
+        self.assertEqual(self.rollback(), {"rolled_back": 3})
+        for name in PUBLIC_BUCKETS:
+            self.assertEqual(self.public_access_prevention(name), "inherited")
+            self.assertEqual(self.bindings(name), self.original[name])
+
+    def test_rejected_policy_is_not_retried(self):
+        self.remediate()
+        self.backend.set_public_access_prevention("bench-bucket-0", "enforced")
+        entry = next(entry for entry in investigation.iter_rollback_entries(self.journal)
+                     if entry["bucket_name"] == "bench-bucket-0")
+        calls_before = self.backend.server.calls["storage.buckets.setIamPolicy"]
+
+        result = investigation.rollback_bucket(self.client, entry, self.scheduler)
+        self.assertEqual(result["status"], "failed")
+        self.assertIn("rejected", result["error"])
+        self.assertEqual(self.backend.server.calls["storage.buckets.setIamPolicy"] - calls_before, 1)
+
+    def test_rollback_dry_run_changes_nothing(self):
+        self.remediate(enforce_pap=True)
+        calls_before = (self.backend.server.calls["storage.buckets.setIamPolicy"],
+                        self.backend.server.calls["storage.buckets.patch"])
+
+        self.assertEqual(self.rollback(dry_run=True), {"planned": 3})
+        self.assertEqual((self.backend.server.calls["storage.buckets.setIamPolicy"],
+                          self.backend.server.calls["storage.buckets.patch"]), calls_before)
+        for name in PUBLIC_BUCKETS:
+            self.assertEqual(self.public_access_prevention(name), "enforced")
+
+
+if __name__ == "__main__":
+    unittest.main()
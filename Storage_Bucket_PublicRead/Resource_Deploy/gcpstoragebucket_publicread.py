@@ -1,68 +1,55 @@
 import os
+import sys
+import csv
 import json
 import argparse
 import logging
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from google.auth.exceptions import DefaultCredentialsError
 from google.cloud import storage
-from google.cloud import secretmanager
 from google.api_core.exceptions import Conflict, PermissionDenied, Forbidden, NotFound
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Common"))
+from gcp_clients import GcpClientFactory, load_credentials, pool_size_for  # noqa: E402
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def authenticate_gcp():
+def authenticate_gcp(auth_method=None, secret_name=None, secret_project_id=None):
     """
-    Prompts the user for authentication method and performs the required authentication.
+    Authenticate without prompting, using ADC or a service account key from Secret Manager.
+
+    Args:
+        auth_method (str): "oauth" or "secret"; defaults to "secret" when a secret name is given.
+        secret_name (str): Secret Manager secret holding the service account key JSON.
+        secret_project_id (str): Project containing the secret.
 
     Returns:
-        temp_key_path (str): Path to the temporary key file if created.
+        CredentialProvider: Started provider whose credentials are shared by every client.
     """
-    print("""
-*****************************************************************************
-*                             Authentication Options                         *
-*****************************************************************************
-* 1: GCP User OAuth authenticates and has permissions to directly create    *
-*    the GCP Storage Bucket.                                                *
-*                                                                           *
-* 2: Separation of duties - GCP User OAuth authenticates to retrieve the    *
-*    Secret Manager secret, and the script will use the service account     *
-*    key JSON (secret) to create the storage bucket and its policy IAM      *
-*    binding.                                                               *
-*****************************************************************************
-""")
-
-    auth_method = input("Enter 1 or 2: ").strip()
-    temp_key_path = None
-
-    if auth_method == "1":
-        logger.debug("Chosen authentication method: GCP User OAuth")
-        try:
-            subprocess.run(["gcloud", "auth", "application-default", "print-access-token"], check=True, stdout=subprocess.DEVNULL)
-            logger.info("GCP User OAuth already authenticated.")
-        except subprocess.CalledProcessError:
-            run_gcloud_auth()
-        logger.info("Using GCP User OAuth to directly create the GCP Storage Bucket.")
+    auth_method = auth_method or ("secret" if secret_name else "oauth")
+    try:
+        provider = load_credentials(auth_method, secret_name, secret_project_id, login=run_gcloud_auth)
+    except DefaultCredentialsError as e:
+        logger.error(f"No GCP credentials found; run 'gcloud auth application-default login' first: {e}")
+        exit(1)
+    except NotFound:
+        logger.error(f"Secret '{secret_name}' does not exist in project '{secret_project_id}'.")
+        exit(1)
+    except PermissionDenied:
+        logger.error(f"Missing permissions to access the secret '{secret_name}'.")
+        exit(1)
+    except Exception as e:
+        logger.error(f"Authentication failed: {e}")
+        exit(1)
 
-    elif auth_method == "2":
-        logger.debug("Chosen authentication method: Service Account Key via Secret Manager")
-        try:
-            subprocess.run(["gcloud", "auth", "application-default", "print-access-token"], check=True, stdout=subprocess.DEVNULL)
-            logger.info("GCP User OAuth authenticated to retrieve the secret.")
-        except subprocess.CalledProcessError:
-            run_gcloud_auth()
-
-        secret_name = args.secret_name or input("Enter the name of your secret in Secret Manager: ").strip()
-        logger.debug(f"Using secret name: {secret_name}")
-        temp_key_path = get_service_account_key(secret_name, args.project_id)
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_key_path
-        logger.debug(f"GOOGLE_APPLICATION_CREDENTIALS set to: {temp_key_path}")
+    if auth_method == "secret":
         logger.info("Using Service Account Credentials for bucket operations.")
     else:
-        logger.error("Invalid authentication option. Exiting.")
-        exit(1)
-
-    return temp_key_path
+        logger.info("Using GCP User OAuth to directly create the GCP Storage Bucket.")
+    return provider
 
 def run_gcloud_auth():
     """Executes the 'gcloud auth application-default login' command to authenticate the user."""
@@ -77,71 +64,75 @@ def run_gcloud_auth():
         logger.error("Failed to authenticate using 'gcloud auth application-default login'.")
         exit(1)
 
-def get_service_account_key(secret_name, project_id):
+class IamBindingError(Exception):
+    """Raised when a bucket was created but its public IAM binding could not be set."""
+
+
+def grant_public_read(bucket):
     """
-    Retrieve the service account key from Secret Manager.
+    Grant roles/storage.objectViewer to allUsers on a bucket.
 
     Args:
-        secret_name (str): The name of the secret storing the key.
-        project_id (str): Your GCP project ID.
+        bucket (storage.Bucket): The bucket to update.
+    """
+    policy = bucket.get_iam_policy()
+    logger.debug(f"Current IAM policy: {json.dumps(policy.to_api_repr(), indent=2)}")
+    policy.bindings.append({
+        "role": "roles/storage.objectViewer",
+        "members": {"allUsers"}
+    })
+    bucket.set_iam_policy(policy)
+    logger.debug(f"Updated IAM policy: {json.dumps(policy.to_api_repr(), indent=2)}")
+    logger.info(f"Public read access granted to bucket {bucket.name}.")
+
+
+def provision_public_bucket(client, bucket_name, location=None):
+    """
+    Create a bucket with an existing client and make it publicly readable.
+
+    Args:
+        client (storage.Client): Client for the project the bucket is created in.
+        bucket_name (str): Name of the bucket to be created.
+        location (str): Optional bucket location (defaults to the API default, US).
 
     Returns:
-        str: Path to the temporary JSON key file.
+        storage.Bucket: The created bucket.
+
+    Raises:
+        IamBindingError: If the bucket was created but the public binding could not be set.
     """
-    client = secretmanager.SecretManagerServiceClient()
-    name = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
+    logger.debug(f"Attempting to create bucket: {bucket_name}")
+    new_bucket = client.create_bucket(client.bucket(bucket_name), location=location)
+    logger.info(f"Bucket {new_bucket.name} created successfully.")
+
     try:
-        response = client.access_secret_version(request={"name": name})
-        key_data = response.payload.data.decode("UTF-8")
-        logger.debug(f"Secret {secret_name} retrieved successfully from project {project_id}.")
-    except NotFound:
-        logger.error(f"Secret '{secret_name}' does not exist in project '{project_id}'.")
-        exit(1)
-    except PermissionDenied:
-        logger.error(f"Missing permissions to access the secret '{secret_name}'.")
-        exit(1)
+        grant_public_read(new_bucket)
+    except (PermissionDenied, Forbidden) as e:
+        raise IamBindingError(f"Missing permissions to set IAM policy on bucket {bucket_name}.") from e
 
-    temp_key_path = "temp_service_account_key.json"
-    with open(temp_key_path, "w") as temp_key_file:
-        temp_key_file.write(key_data)
-        logger.debug(f"Service account key saved to temporary file: {temp_key_path}")
+    new_bucket.make_public(recursive=True, future=True)
+    logger.info(f"Bucket {bucket_name} is now publicly accessible at https://storage.googleapis.com/{bucket_name}/")
+    return new_bucket
 
-    return temp_key_path
 
-def create_public_bucket(bucket_name, project_id):
+def create_public_bucket(bucket_name, project_id, client=None):
     """
     Create a GCP Storage bucket with public read access.
 
     Args:
         bucket_name (str): Name of the bucket to be created.
         project_id (str): Your GCP project ID.
+        client (storage.Client): Optional long-lived client for the project, e.g. from GcpClientFactory.
     """
     try:
-        logger.debug(f"Initializing GCP Storage client for project {project_id}")
-        client = storage.Client(project=project_id)
-
-        logger.debug(f"Attempting to create bucket: {bucket_name}")
-        bucket = client.bucket(bucket_name)
-        new_bucket = client.create_bucket(bucket)
-        logger.info(f"Bucket {new_bucket.name} created successfully.")
-
-        try:
-            policy = new_bucket.get_iam_policy()
-            logger.debug(f"Current IAM policy: {json.dumps(policy.to_api_repr(), indent=2)}")
-            policy.bindings.append({
-                "role": "roles/storage.objectViewer",
-                "members": {"allUsers"}
-            })
-            new_bucket.set_iam_policy(policy)
-            logger.debug(f"Updated IAM policy: {json.dumps(policy.to_api_repr(), indent=2)}")
-            logger.info(f"Public read access granted to bucket {bucket_name}.")
-        except (PermissionDenied, Forbidden):
-            logger.error(f"Missing permissions to set IAM policy on bucket {bucket_name}.")
-            exit(1)
-
-        bucket.make_public(recursive=True, future=True)
-        logger.info(f"Bucket {bucket_name} is now publicly accessible at https://storage.googleapis.com/{bucket_name}/")
+        if client is None:
+            logger.debug(f"Initializing GCP Storage client for project {project_id}")
+            client = storage.Client(project=project_id)
+        provision_public_bucket(client, bucket_name)
 
+    except IamBindingError as e:
+        logger.error(str(e))
+        exit(1)
     except Conflict:
         logger.error(f"Bucket {bucket_name} already exists.")
     except (PermissionDenied, Forbidden):
@@ -151,11 +142,135 @@ def create_public_bucket(bucket_name, project_id):
         logger.error(f"An unexpected error occurred: {e}")
         exit(1)
 
+
+def load_manifest(manifest_path, default_project_id=None):
+    """
+    Load the buckets to provision from a CSV or YAML manifest.
+
+    CSV manifests need a `bucket_name` column and may add `project_id` and `location`.
+    YAML manifests hold a list of mappings with the same keys, either at the top level
+    or under a `buckets` key.
+
+    Args:
+        manifest_path (str): Path to the .csv, .yaml or .yml manifest.
+        default_project_id (str): Project used for entries without a `project_id`.
+
+    Returns:
+        list: Manifest entries as dicts with `bucket_name`, `project_id` and `location` keys.
+    """
+    if manifest_path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("PyYAML is required for YAML manifests (pip3 install pyyaml).")
+        with open(manifest_path) as manifest_file:
+            raw_entries = yaml.safe_load(manifest_file) or []
+        if isinstance(raw_entries, dict):
+            raw_entries = raw_entries.get("buckets") or []
+        if not isinstance(raw_entries, list):
+            raise ValueError(f"Manifest {manifest_path} must hold a list of buckets.")
+    else:
+        with open(manifest_path, newline="") as manifest_file:
+            raw_entries = list(csv.DictReader(manifest_file))
+
+    entries = []
+    for index, raw_entry in enumerate(raw_entries, start=1):
+        if not isinstance(raw_entry, dict):
+            raise ValueError(f"Manifest entry {index} must be a mapping with a bucket_name: {raw_entry!r}")
+        # YAML may load names and project IDs as numbers.
+        bucket_name = str(raw_entry.get("bucket_name") or "").strip()
+        project_id = str(raw_entry.get("project_id") or default_project_id or "").strip()
+        if not bucket_name or not project_id:
+            raise ValueError(f"Manifest entry {index} needs a bucket_name and a project_id: {raw_entry}")
+        entries.append({
+            "bucket_name": bucket_name,
+            "project_id": project_id,
+            "location": str(raw_entry.get("location") or "").strip() or None,
+        })
+    logger.debug(f"Loaded {len(entries)} buckets from manifest {manifest_path}")
+    return entries
+
+
+def provision_manifest_entry(clients, entry):
+    """
+    Provision one manifest entry and report the outcome instead of exiting.
+
+    Args:
+        clients (GcpClientFactory): Factory providing the project's long-lived storage client.
+        entry (dict): Manifest entry from load_manifest.
+
+    Returns:
+        dict: The entry with a `status` of `created`, `exists` or `failed`, and an `error` when failed.
+    """
+    result = dict(entry)
+    try:
+        provision_public_bucket(clients.storage_client(entry["project_id"]), entry["bucket_name"], entry["location"])
+        result["status"] = "created"
+    except Conflict:
+        logger.warning(f"Bucket {entry['bucket_name']} already exists.")
+        result["status"] = "exists"
+    except IamBindingError as e:
+        logger.error(str(e))
+        result.update(status="failed", error=str(e))
+    except (PermissionDenied, Forbidden):
+        error = f"Missing permissions to create bucket {entry['bucket_name']}."
+        logger.error(error)
+        result.update(status="failed", error=error)
+    except Exception as e:
+        logger.error(f"Failed to provision bucket {entry['bucket_name']}: {e}")
+        result.update(status="failed", error=str(e))
+    return result
+
+
+def create_buckets_from_manifest(entries, concurrency=8, report_path="bucket_provisioning_report.json",
+                                 clients=None):
+    """
+    Create public buckets for every manifest entry concurrently.
+
+    One storage.Client per project is shared by all workers, and the per-bucket
+    outcome is written to a JSON report.
+
+    Args:
+        entries (list): Manifest entries from load_manifest.
+        concurrency (int): Number of buckets provisioned in parallel.
+        report_path (str): Path of the per-bucket JSON report.
+        clients (GcpClientFactory): Factory whose per-project clients are reused, or any object
+            with the same `storage_client` method (e.g. the in-process fake in
+            ../Benchmark/fake_gcp_backend.py). A factory using Application Default Credentials
+            is created, and closed afterwards, by default.
+
+    Returns:
+        list: Per-bucket results from provision_manifest_entry, in manifest order.
+    """
+    owned_clients = clients is None
+    if owned_clients:
+        clients = GcpClientFactory(pool_size=pool_size_for(concurrency))
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda entry: provision_manifest_entry(clients, entry), entries))
+    finally:
+        if owned_clients:
+            clients.close()
+
+    with open(report_path, "w") as report_file:
+        json.dump(results, report_file, indent=2)
+
+    counts = {status: sum(1 for result in results if result["status"] == status)
+              for status in ("created", "exists", "failed")}
+    logger.info(f"Provisioned {len(results)} buckets: {counts['created']} created, "
+                f"{counts['exists']} already existed, {counts['failed']} failed. Report saved to {report_path}")
+    return results
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Create a GCP Storage bucket with public access.")
     parser.add_argument("--bucket-name", type=str, help="Name of the GCP Storage bucket to create.")
     parser.add_argument("--project-id", type=str, help="GCP project ID where the bucket will be created.")
+    parser.add_argument("--auth-method", choices=["oauth", "secret"], help="oauth uses Application Default Credentials, secret a service account key from Secret Manager (default: secret when --secret-name is given, otherwise oauth).")
     parser.add_argument("--secret-name", type=str, help="Name of the Secret Manager secret containing service account key.")
+    parser.add_argument("--secret-project-id", type=str, help="Project containing the secret (default: --project-id).")
+    parser.add_argument("--manifest", type=str, help="CSV or YAML manifest of buckets (bucket_name, project_id, location) to create in one run.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of manifest buckets created in parallel (default: 8).")
     parser.add_argument("--debug", action="store_true", help="Enable debug logging.")
 
     args = parser.parse_args()
@@ -164,17 +279,37 @@ if __name__ == "__main__":
         logger.setLevel(logging.DEBUG)
         logger.debug("Debug logging enabled.")
 
-    bucket_name = args.bucket_name or input("Enter the desired bucket name: ").strip()
-    logger.debug(f"Bucket name provided: {bucket_name}")
+    if args.manifest:
+        if args.concurrency < 1:
+            parser.error("--concurrency must be at least 1.")
+        try:
+            entries = load_manifest(args.manifest, default_project_id=args.project_id)
+        except (OSError, ValueError) as e:
+            logger.error(f"Invalid manifest {args.manifest}: {e}")
+            exit(1)
+    else:
+        bucket_name = args.bucket_name or input("Enter the desired bucket name: ").strip()
+        logger.debug(f"Bucket name provided: {bucket_name}")
+
+        project_id = args.project_id or input("Enter your GCP project ID: ").strip()
+        logger.debug(f"Project ID provided: {project_id}")
+
+    secret_project_id = args.secret_project_id or args.project_id
+    if (args.auth_method == "secret" or (args.auth_method is None and args.secret_name)) and \
+            not (args.secret_name and secret_project_id):
+        parser.error("Service account authentication needs --secret-name and --secret-project-id or --project-id.")
 
-    project_id = args.project_id or input("Enter your GCP project ID: ").strip()
-    logger.debug(f"Project ID provided: {project_id}")
+    provider = authenticate_gcp(args.auth_method, args.secret_name, secret_project_id)
 
-    temp_key_path = authenticate_gcp()
+    clients = GcpClientFactory(provider.credentials, pool_size=pool_size_for(args.concurrency))
 
     try:
-        create_public_bucket(bucket_name, project_id)
+        if args.manifest:
+            results = create_buckets_from_manifest(entries, concurrency=args.concurrency, clients=clients)
+            if any(result["status"] == "failed" for result in results):
+                exit(1)
+        else:
+            create_public_bucket(bucket_name, project_id, client=clients.storage_client(project_id))
     finally:
-        if temp_key_path and os.path.exists(temp_key_path):
-            os.remove(temp_key_path)
-            logger.debug(f"Temporary key file {temp_key_path} deleted.")
+        clients.close()
+        provider.stop()